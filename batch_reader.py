@@ -0,0 +1,165 @@
+import time
+
+from ingest_stats import IngestStats
+from line_framer import LineFramer
+from line_parser import LineParser
+from timestamps import to_wall_ns
+
+
+class ReadSizer:
+    """
+    Estimate the incoming data rate and decide how many bytes are worth
+    waking up for. At high baud rates this turns a read per handful of
+    bytes into a few reads per latency budget; at low rates it keeps
+    reading byte by byte so nothing waits longer than it must.
+
+    If the transport reports its driver receive buffer ('rx_buffer_size'),
+    the target stays at half of it, so waiting for a large read never lets
+    the driver buffer fill up and drop bytes.
+    """
+
+    def __init__(self, max_latency, min_read=64, max_read=65536, smoothing=0.2, rx_buffer_size=None):
+        self.max_latency = max_latency
+        self.min_read = min_read
+        self.max_read = max_read if rx_buffer_size is None else min(max_read, rx_buffer_size // 2)
+        self.smoothing = smoothing
+        # Bytes per second, exponentially smoothed
+        self.rate = 0.0
+        self._last_time = None
+
+    def observe(self, nbytes, now):
+        """Account for 'nbytes' received at monotonic time 'now'."""
+        if self._last_time is not None and now > self._last_time:
+            sample = nbytes / (now - self._last_time)
+            self.rate += self.smoothing * (sample - self.rate)
+        self._last_time = now
+
+    def target(self):
+        """Bytes expected within half the latency budget, clamped."""
+        return max(self.min_read, min(self.max_read, int(self.rate * self.max_latency / 2)))
+
+    def wait_time(self, waiting, budget):
+        """
+        Seconds to sleep until about target() bytes are queued, given
+        'waiting' bytes already there and 'budget' seconds of latency left.
+        """
+        missing = self.target() - waiting
+        if missing <= 0 or self.rate <= 0:
+            return 0.0
+        return min(missing / self.rate, budget)
+
+
+class BatchReader:
+    """
+    Read a transport, frame its lines and parse them in latency-bounded batches.
+
+    Bytes are received with readinto() straight into the LineFramer's
+    preallocated buffer, so reads do not allocate. The complete lines of
+    each read are still copied out once and split into one bytes object
+    per line by LineParser.parse_region(). The raw bytes are only copied
+    out again when 'keep_raw' is set (for the terminal view).
+
+    With 'adaptive' set, a ReadSizer paces the reads: when a few bytes are
+    already queued and more are expected shortly, the reader sleeps (within
+    the latency budget) and then takes them all in one read, instead of
+    waking up for every few bytes.
+
+    Once a batch holds its first byte, the reader never blocks past the
+    latency budget: an empty queue is waited on with the transport's
+    wait_readable() for what is left of the budget, and the batch is
+    returned if nothing comes.
+
+    An optional 'stage' (e.g. a host_filters.FilterStage) gets every
+    batch of records and its derived records are appended to the batch.
+
+    Holds no Qt state; SerialReaderThread and the headless capture both
+    drive it by calling read_batch() in a loop.
+    """
+
+    def __init__(self, transport, max_latency=0.02, max_batch_bytes=65536, parser=None, keep_raw=True,
+                 stats=None, adaptive=True, stage=None):
+        self.transport = transport
+        # Longest time (s) a received byte may wait before its batch is returned
+        self.max_latency = max_latency
+        # Return early once a batch holds this many raw bytes
+        self.max_batch_bytes = max_batch_bytes
+        # Copy the received bytes into each batch (for display)
+        self.keep_raw = keep_raw
+        self.line_framer = LineFramer()
+        self.line_parser = parser or LineParser()
+        self.read_sizer = (ReadSizer(max_latency, rx_buffer_size=getattr(transport, "rx_buffer_size", None))
+                           if adaptive else None)
+        self.stage = stage
+        # Health counters; line counts come straight from the parser
+        self.stats = stats or IngestStats()
+        self.stats.attach(self.line_parser, self.line_framer)
+
+    def read_batch(self):
+        """
+        Return (records, raw bytes) for the next batch, or None if the
+        transport stayed idle (or closed) for one read timeout. 'raw' is
+        b"" unless keep_raw is set.
+        """
+        transport = self.transport
+        framer = self.line_framer
+        parse_region = self.line_parser.parse_region
+        sizer = self.read_sizer
+        stats = self.stats
+        # Transports that know their driver buffer size can report overruns
+        rx_buffer_size = getattr(transport, "rx_buffer_size", None) or float("inf")
+        raw = bytearray() if self.keep_raw else None
+        records = []
+        received = 0
+        deadline = None
+        while transport.is_open:
+            # Drain everything the driver already holds; before the first
+            # byte of a batch, block (up to the port timeout) for it
+            waiting = transport.in_waiting
+            if waiting and deadline is None:
+                # The latency budget starts with the first byte we see
+                deadline = time.monotonic() + self.max_latency
+            if sizer is not None and deadline is not None:
+                pause = sizer.wait_time(waiting, deadline - time.monotonic())
+                if pause > 0:
+                    # More is on its way; collect it in one read
+                    time.sleep(pause)
+                    waiting = transport.in_waiting
+            if not waiting and deadline is not None:
+                # A batch is under way: wait only for what is left of its
+                # latency budget, never for a whole blocking read
+                if not transport.wait_readable(deadline - time.monotonic()):
+                    break
+                waiting = transport.in_waiting
+            if waiting >= rx_buffer_size:
+                # We fell behind far enough that the driver may have dropped bytes
+                stats.driver_buffer_full += 1
+            chunk = framer.readinto(transport, waiting or 1)
+            n = len(chunk)
+            stats.wakeups += 1
+            if n:
+                # Stamped as the bytes arrive, before any queueing towards the GUI
+                now = to_wall_ns(time.monotonic_ns())
+                received += n
+                stats.reads += 1
+                if sizer is not None:
+                    sizer.observe(n, time.monotonic())
+                if raw is not None:
+                    raw += chunk
+                region = framer.take_complete()
+                if region:
+                    started = time.perf_counter()
+                    parse_region(framer.buffer, region[0], region[1], now, records)
+                    stats.parse_seconds += time.perf_counter() - started
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_latency
+            chunk.release()
+            # One batch per tick: when the latency budget is spent,
+            # the batch is large, or the port went idle
+            if not n or received >= self.max_batch_bytes or time.monotonic() >= deadline:
+                break
+        if not received:
+            return None
+        stats.bytes_read += received
+        if self.stage is not None and records:
+            records.extend(self.stage.process(records))
+        return records, bytes(raw) if raw is not None else b""
@@ -0,0 +1,400 @@
+"""
+Micro-benchmarks for the ingest and rendering paths.
+
+Run e.g. 'python bench.py classifier'; see 'python bench.py --help'.
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from batch_reader import BatchReader
+from line_framer import LineFramer
+from line_parser import LineParser
+import transports
+
+# One representative line per message type
+SAMPLE_LINES = {
+    "distance": b"Anchor 3 Device 2 Distance RAW: 3.4512",
+    "legacy_distance": b"Anchor 3 Distance RAW: 3.4512",
+    "location": b"location : (0.42, -1.37)",
+    "oem": b"Received OEM App Command: unlock",
+    "unmatched": b"[BLE] connection event 1234 on handle 0x0041",
+}
+
+
+def report(name, count, elapsed, unit="lines", precision=0):
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"{name:<24} {rate:>14,.{precision}f} {unit}/s")
+
+
+def bench_classifier(args):
+    """Lines/second through LineParser for each message type."""
+    for name, line in SAMPLE_LINES.items():
+        parser = LineParser()
+        lines = [line] * args.lines
+        start = time.perf_counter()
+        parser.parse_lines(lines, 0.0)
+        report(name, args.lines, time.perf_counter() - start)
+
+
+def make_stream(size):
+    """About 'size' bytes of typical firmware output."""
+    block = b"".join(line + b"\r\n" for line in SAMPLE_LINES.values())
+    return block * max(1, size // len(block))
+
+
+def drain(transport, total):
+    """Read like SerialReaderThread until 'total' bytes arrived; return elapsed seconds."""
+    received = 0
+    start = time.perf_counter()
+    while received < total and transport.is_open:
+        received += len(transport.read(transport.in_waiting or 1))
+    return time.perf_counter() - start
+
+
+def writer_thread(write, data, chunk=4096):
+    def run():
+        for i in range(0, len(data), chunk):
+            write(data[i:i + chunk])
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def bench_transport_serial(data):
+    # pyserial's loop:// queues byte by byte, so keep this run small
+    data = data[:256 * 1024]
+    port = transports.open_transport("loop://", timeout=0.1)
+    writer_thread(port.write, data)
+    return port, drain(port, len(data)), len(data)
+
+
+def bench_transport_tcp_client(data):
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def serve():
+        conn, _ = server.accept()
+        conn.sendall(data)
+        conn.close()
+    threading.Thread(target=serve, daemon=True).start()
+    transport = transports.open_transport("tcp://127.0.0.1:%d" % server.getsockname()[1])
+    elapsed = drain(transport, len(data))
+    server.close()
+    return transport, elapsed, len(data)
+
+
+def bench_transport_tcp_server(data):
+    transport = transports.open_transport("tcp-server://127.0.0.1:0")
+    client = socket.create_connection(transport.address)
+    writer_thread(client.sendall, data)
+    elapsed = drain(transport, len(data))
+    client.close()
+    return transport, elapsed, len(data)
+
+
+def bench_transport_pipe(data):
+    path = os.path.join(tempfile.mkdtemp(), "bench.fifo")
+    os.mkfifo(path)
+    transport = transports.open_transport("pipe://" + path)
+    fd = os.open(path, os.O_WRONLY)
+    writer_thread(lambda chunk: os.write(fd, chunk), data)
+    elapsed = drain(transport, len(data))
+    os.close(fd)
+    os.unlink(path)
+    return transport, elapsed, len(data)
+
+
+def bench_transport_file(data):
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as capture:
+        capture.write(data)
+    transport = transports.open_transport("file://" + capture.name)
+    elapsed = drain(transport, len(data))
+    os.unlink(capture.name)
+    return transport, elapsed, len(data)
+
+
+def bench_transports(args):
+    """Raw read throughput of each transport, using the reader's read pattern."""
+    data = make_stream(args.megabytes * 1024 * 1024)
+    cases = [
+        ("serial (loop://)", bench_transport_serial),
+        ("tcp client", bench_transport_tcp_client),
+        ("tcp server", bench_transport_tcp_server),
+        ("pipe (fifo)", bench_transport_pipe),
+        ("file replay", bench_transport_file),
+    ]
+    for name, case in cases:
+        if name.startswith("pipe") and os.name != "posix":
+            continue
+        transport, elapsed, size = case(data)
+        transport.close()
+        report(name, size / 1e6, elapsed, unit="MB", precision=1)
+
+
+def bench_reader(args):
+    """
+    Framing + parsing throughput of a capture file: read() with a fresh bytes
+    object per call versus BatchReader's readinto() into a preallocated buffer.
+
+    Both paths still build one bytes object per line and one record per
+    sample, which dominate allocation, so throughput is about the same.
+    The peak traced memory is higher for readinto(): BatchReader reads and
+    parses up to max_batch_bytes at a time, against 4096-byte reads here.
+    """
+    data = make_stream(args.megabytes * 1024 * 1024)
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as capture:
+        capture.write(data)
+
+    def read_and_feed(transport):
+        framer = LineFramer()
+        parser = LineParser()
+        while transport.is_open:
+            chunk = transport.read(4096)
+            parser.parse_lines(framer.feed(chunk), 0.0)
+
+    def batch_reader(transport):
+        reader = BatchReader(transport, keep_raw=False)
+        while reader.read_batch():
+            pass
+
+    for name, run in (("read() + feed()", read_and_feed), ("readinto()", batch_reader)):
+        transport = transports.open_transport("file://" + capture.name)
+        start = time.perf_counter()
+        run(transport)
+        report(name, len(data) / 1e6, time.perf_counter() - start, unit="MB", precision=1)
+        # Separate run: tracing slows everything down
+        transport = transports.open_transport("file://" + capture.name)
+        tracemalloc.start()
+        run(transport)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'':<24} {peak / 1024:>14,.0f} KiB peak traced memory")
+    os.unlink(capture.name)
+
+
+class PacedTransport:
+    """
+    Serial port stand-in that makes 'data' available at 'baud' (10 bits per
+    byte) in real time, with pyserial's blocking read semantics.
+
+    With 'burst' set, the data comes in bursts of that many bytes, one
+    every 'period' seconds, with the line idle in between (a device that
+    reports a few lines per ranging round).
+    """
+
+    def __init__(self, data, baud, timeout=0.1, burst=None, period=None):
+        self.data = memoryview(data)
+        self.byte_time = 10.0 / baud
+        self.timeout = timeout
+        self.burst = burst
+        self.period = period
+        self.consumed = 0
+        self.start = time.monotonic()
+        self.is_open = True
+
+    def arrived(self):
+        elapsed = time.monotonic() - self.start
+        if self.burst is None:
+            return min(len(self.data), int(elapsed / self.byte_time))
+        bursts = int(elapsed // self.period)
+        within = min(self.burst, int((elapsed - bursts * self.period) / self.byte_time))
+        return min(len(self.data), bursts * self.burst + within)
+
+    def arrival_time(self, index):
+        """When the first 'index' bytes have all arrived."""
+        if self.burst is None:
+            return self.start + index * self.byte_time
+        bursts, within = divmod(index - 1, self.burst)
+        return self.start + bursts * self.period + (within + 1) * self.byte_time
+
+    def wait_readable(self, timeout):
+        if not self.in_waiting and self.consumed < len(self.data):
+            due = self.arrival_time(self.consumed + 1) - time.monotonic()
+            time.sleep(max(0.0, min(due, timeout)))
+        return self.in_waiting > 0
+
+    @property
+    def in_waiting(self):
+        return self.arrived() - self.consumed
+
+    def readinto(self, buffer):
+        if self.consumed >= len(self.data):
+            self.is_open = False
+            return 0
+        if not self.in_waiting:
+            # Block until the next byte is due, or the timeout
+            due = self.arrival_time(self.consumed + 1) - time.monotonic()
+            time.sleep(max(0.0, min(due, self.timeout)))
+        n = min(len(buffer), self.in_waiting)
+        buffer[:n] = self.data[self.consumed:self.consumed + n]
+        self.consumed += n
+        return n
+
+
+# (label, baud, lines per burst or None for a continuous stream, seconds between bursts)
+WAKEUP_CASES = [(f"{baud} stream", baud, None, None) for baud in (9600, 115200, 921600)] + [
+    ("921600 20 lines/200ms", 921600, 20, 0.2),
+    ("115200 1 line/200ms", 115200, 1, 0.2),
+]
+
+
+def bench_wakeups(args):
+    """
+    Reads per second and batch latency (from the first byte of a batch to
+    its return, with the default 20 ms budget) for continuous streams and
+    for bursts separated by idle gaps, with fixed (read whatever is
+    queued) and adaptive read sizing.
+    """
+    line = SAMPLE_LINES["distance"] + b"\r\n"
+    for label, baud, lines, period in WAKEUP_CASES:
+        for adaptive in (False, True):
+            if lines is None:
+                data = make_stream(int(baud / 10 * args.seconds))
+                transport = PacedTransport(data, baud)
+            else:
+                data = line * (lines * max(1, int(args.seconds / period)))
+                transport = PacedTransport(data, baud, burst=lines * len(line), period=period)
+            reader = BatchReader(transport, keep_raw=False, adaptive=adaptive)
+            latencies = []
+            while transport.is_open:
+                first = transport.consumed
+                if reader.read_batch():
+                    latencies.append(time.monotonic() - transport.arrival_time(first + 1))
+            elapsed = time.monotonic() - transport.start
+            mode = "adaptive" if adaptive else "fixed"
+            latencies = sorted(latencies) or [0.0]
+            print(f"{label:<22} {mode:<9} {reader.stats.wakeups / elapsed:>9,.0f} reads/s  "
+                  f"latency median {1000 * latencies[len(latencies) // 2]:6.1f} ms  "
+                  f"max {1000 * latencies[-1]:6.1f} ms")
+
+
+def synthetic_store(series, rate, seconds):
+    """A SessionStore of 'series' anchors reporting at about 'rate' Hz, each with its own phase."""
+    import numpy as np
+    from line_parser import DistanceSample
+    from session_store import SessionStore
+    from timestamps import NS_PER_S
+
+    rng = np.random.default_rng(0)
+    samples = []
+    for anchor in range(1, series + 1):
+        # Slightly different rates, so no two series share a time base
+        period = NS_PER_S / (rate * (0.8 + 0.4 * anchor / series))
+        times = (np.arange(int(seconds * NS_PER_S / period)) * period
+                 + rng.uniform(0, period / 2)).astype(np.int64)
+        samples.extend(DistanceSample(anchor, 1, "RAW", float(d), int(t))
+                       for t, d in zip(times, rng.uniform(0.5, 10.0, len(times))))
+    samples.sort(key=lambda s: s.timestamp)
+    store = SessionStore()
+    store.append(samples)
+    return store
+
+
+def bench_align(args):
+    """Cross-anchor alignment: bulk mode over a session, and incremental updates."""
+    from resampler import METHODS, SeriesAligner, align_session
+    from session_store import SessionStore
+
+    store = synthetic_store(16, 50, args.seconds * 20)
+    for method in METHODS:
+        start = time.perf_counter()
+        grid, _ = align_session(store, period=0.02, method=method)
+        report(f"bulk {method}", grid.size * len(store.registry), time.perf_counter() - start, unit="cells")
+    # Incremental: feed the same rows in slices of about 100 ms of data
+    live = SessionStore()
+    aligner = SeriesAligner(live, range(16), period=0.02)
+    cells = 0
+    step = max(1, store.size // int(args.seconds * 200))
+    start = time.perf_counter()
+    for row in range(0, store.size, step):
+        live.append(store_rows(store, row, row + step))
+        grid, _ = aligner.update()
+        cells += grid.size * 16
+    report("incremental linear", cells, time.perf_counter() - start, unit="cells")
+
+
+def store_rows(store, start, stop):
+    """DistanceSamples for rows [start, stop) of a SessionStore."""
+    from line_parser import DistanceSample
+
+    keys = store.registry.keys
+    return [DistanceSample(*keys[series_id], float(distance), int(timestamp))
+            for series_id, timestamp, distance in zip(
+                store.series_id[start:stop].tolist(), store.timestamp[start:stop].tolist(),
+                store.distance[start:stop].tolist())]
+
+
+def bench_render(args):
+    """
+    Frame time of one curve against its point count, at full detail
+    (symbols, no downsampling) and with the plotter's level of detail
+    (peak downsampling, clip-to-view, symbols only for few points).
+    Renders offscreen unless QT_QPA_PLATFORM says otherwise.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import numpy as np
+    import pyqtgraph as pg
+    from PyQt5 import QtWidgets
+    from level_of_detail import visible_points, wants_symbols
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    rng = np.random.default_rng(0)
+    for lod in (False, True):
+        widget = pg.PlotWidget()
+        widget.resize(1200, 600)
+        widget.show()
+        if lod:
+            widget.setDownsampling(auto=True, mode='peak')
+            widget.setClipToView(True)
+        curve = widget.plot(pen='r', symbol='o', symbolPen='r', symbolBrush='r')
+        for points in (100, 1000, 10000, 100000):
+            x = np.arange(points, dtype=np.float64) / 50.0
+            y = 3.0 + rng.normal(0.0, 0.2, points)
+            start = time.perf_counter()
+            for frame in range(args.frames):
+                curve.setData(x, y + 0.001 * frame)
+                if lod:
+                    showing = curve.opts['symbol'] is not None
+                    if wants_symbols(showing, visible_points(x, *widget.viewRange()[0])) != showing:
+                        curve.setSymbol(None if showing else 'o')
+                app.processEvents()
+                # Forces a complete repaint, as the next screen refresh would
+                widget.grab()
+            elapsed = time.perf_counter() - start
+            mode = "level of detail" if lod else "full detail"
+            print(f"{mode:<16} {points:>8,} points {1000 * elapsed / args.frames:>9.2f} ms/frame")
+        widget.close()
+
+
+BENCHMARKS = {
+    "align": bench_align,
+    "classifier": bench_classifier,
+    "reader": bench_reader,
+    "render": bench_render,
+    "transports": bench_transports,
+    "wakeups": bench_wakeups,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--lines", type=int, default=200000, help="lines per run")
+    parser.add_argument("--megabytes", type=int, default=16, help="bytes per transport run (MB)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each paced run")
+    parser.add_argument("--frames", type=int, default=20, help="frames drawn per render run")
+    args = parser.parse_args()
+    names = sorted(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Headless capture: read a port, parse distances and write logs and stats.
+
+Uses the same transports, framing and line grammar as the GUI but never
+imports PyQt5 or pyqtgraph, so it suits long soak tests on small boxes:
+
+    python headless.py COM3 --baud 921600 --log soak.log --stats soak_stats.jsonl
+    python headless.py tcp://192.168.1.20:7000 --duration 3600
+"""
+import argparse
+import json
+import sys
+import time
+
+from batch_reader import BatchReader
+from ingest_stats import rates
+from line_parser import DistanceSample
+from session_log import LOG_HEADER, format_log_line
+from transports import open_transport
+
+
+class HeadlessCapture:
+    """Drive a BatchReader, logging every distance sample and keeping totals."""
+
+    def __init__(self, transport, log_file=None, stats_file=None, stats_interval=10.0,
+                 max_latency=0.02, adaptive=True):
+        # Nothing is displayed, so raw bytes are never copied out of the receive buffer
+        self.reader = BatchReader(transport, max_latency=max_latency, keep_raw=False, adaptive=adaptive)
+        self.log_file = log_file
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        self.samples = 0
+        # Sample count per (anchor_id, device_id, type_str)
+        self.series_counts = {}
+        self.started = time.monotonic()
+        self._last_snapshot = self.reader.stats.snapshot()
+
+    def run(self, duration=None):
+        transport = self.reader.transport
+        next_report = self.started + self.stats_interval
+        end = self.started + duration if duration else None
+        try:
+            while transport.is_open:
+                batch = self.reader.read_batch()
+                if batch:
+                    self.handle_batch(*batch)
+                now = time.monotonic()
+                if now >= next_report:
+                    self.report(now)
+                    next_report = now + self.stats_interval
+                if end is not None and now >= end:
+                    break
+        finally:
+            # Final totals, also on Ctrl+C
+            self.report(time.monotonic())
+
+    def handle_batch(self, records, raw):
+        log_lines = []
+        for record in records:
+            if isinstance(record, DistanceSample):
+                key = (record.anchor_id, record.device_id, record.type_str)
+                self.series_counts[key] = self.series_counts.get(key, 0) + 1
+                self.samples += 1
+                if self.log_file:
+                    log_lines.append(format_log_line(record))
+        if log_lines:
+            # One write per batch
+            self.log_file.write("".join(log_lines))
+            self.log_file.flush()
+
+    def report(self, now):
+        snapshot = self.reader.stats.snapshot()
+        rate = rates(self._last_snapshot, snapshot)
+        self._last_snapshot = snapshot
+        stats = {
+            "elapsed_s": round(now - self.started, 3),
+            "bytes_per_s": round(rate["bytes_read_per_s"], 1),
+            "lines_per_s": round(rate["lines_per_s"], 1),
+            "samples_per_s": round(rate["lines_by_type_per_s"].get("distance", 0.0), 1),
+            "samples": self.samples,
+            "series": len(self.series_counts),
+            "reads_per_s": round(rate["wakeups_per_s"], 1),
+            "parse_load": round(rate["parse_load"], 4),
+        }
+        stats.update((key, value) for key, value in snapshot.items() if key != "time")
+        print(
+            f"[{stats['elapsed_s']:>9.1f}s] {stats['bytes_per_s']:>10,.0f} B/s "
+            f"{stats['lines_per_s']:>8,.0f} lines/s {stats['samples_per_s']:>8,.0f} samples/s "
+            f"series={stats['series']} unmatched={stats['unmatched_lines']} "
+            f"dropped={stats['overflowed_lines']} rx_full={stats['driver_buffer_full']}",
+            file=sys.stderr)
+        if self.stats_file:
+            self.stats_file.write(json.dumps(stats) + "\n")
+            self.stats_file.flush()
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("port", help="COM port, device path or transport URL (tcp://, pipe://, file://, ...)")
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate for serial ports")
+    parser.add_argument("--log", help="append distance samples to this log file")
+    parser.add_argument("--stats", help="append JSON stats lines to this file")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds between stats reports")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--max-latency", type=float, default=20.0,
+                        help="longest time (ms) a received byte waits before it is processed")
+    parser.add_argument("--fixed-reads", action="store_true",
+                        help="read whatever is queued on every wakeup instead of pacing reads")
+    args = parser.parse_args(argv)
+
+    transport = open_transport(args.port, args.baud, timeout=0.1)
+    if hasattr(transport, "slave_name"):
+        print(f"Listening on pty {transport.slave_name}", file=sys.stderr)
+    log_file = open(args.log, 'a') if args.log else None
+    stats_file = open(args.stats, 'a') if args.stats else None
+    try:
+        if log_file:
+            log_file.write(LOG_HEADER)
+        capture = HeadlessCapture(transport, log_file, stats_file, args.stats_interval,
+                                  args.max_latency / 1000.0, not args.fixed_reads)
+        capture.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+        for f in (log_file, stats_file):
+            if f:
+                f.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+
+from timestamps import NS_PER_S
+
+
+class RollingHeatmap:
+    """
+    Distance of every series over the last 'bins' time bins, as one
+    series x time image for an ImageItem.
+
+    Each cell holds the mean distance of the samples of that series that
+    fell into the bin (NaN if none). The newest bin is the last column;
+    when time moves on, the sum and count arrays are shifted left in place
+    and the freed columns cleared, so a batch costs one shift at most plus
+    an unbuffered add of its samples, and a frame one division, however
+    many series there are. Rows are series IDs; the arrays grow by doubling
+    when a new series does not fit. advance() moves time on without
+    samples, so the map keeps scrolling while every series is quiet.
+    """
+
+    def __init__(self, bins=600, bin_seconds=0.1, rows=16):
+        self.bins = bins
+        self.bin_ns = int(bin_seconds * NS_PER_S)
+        self._sums = np.zeros((rows, bins))
+        self._counts = np.zeros((rows, bins), dtype=np.int32)
+        # Number of series seen, and the absolute bin number of the last column
+        self.rows = 0
+        self.head = None
+
+    def clear(self):
+        self._sums[:] = 0.0
+        self._counts[:] = 0
+        self.rows = 0
+        self.head = None
+
+    def _grow(self, rows):
+        capacity = len(self._sums)
+        while capacity < rows:
+            capacity *= 2
+        for name in ("_sums", "_counts"):
+            old = getattr(self, name)
+            grown = np.zeros((capacity, self.bins), dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _shift(self, count):
+        if count >= self.bins:
+            self._sums[:] = 0.0
+            self._counts[:] = 0
+            return
+        # Overlapping slices; NumPy copies them correctly in place
+        self._sums[:, :-count] = self._sums[:, count:]
+        self._counts[:, :-count] = self._counts[:, count:]
+        self._sums[:, -count:] = 0.0
+        self._counts[:, -count:] = 0
+
+    def advance(self, time):
+        """Make the bin of 'time' (int ns) the newest column; return whether the map moved."""
+        newest = time // self.bin_ns
+        if self.head is None or newest <= self.head:
+            return False
+        self._shift(newest - self.head)
+        self.head = newest
+        return True
+
+    def add(self, series_ids, times, values):
+        """Add samples given as arrays of series IDs, int ns timestamps and distances."""
+        if not len(series_ids):
+            return
+        series_ids = np.asarray(series_ids, dtype=np.intp)
+        bins = np.asarray(times, dtype=np.int64) // self.bin_ns
+        newest = int(bins.max())
+        if self.head is None:
+            self.head = newest
+        else:
+            self.advance(newest * self.bin_ns)
+        rows = int(series_ids.max()) + 1
+        if rows > len(self._sums):
+            self._grow(rows)
+        self.rows = max(self.rows, rows)
+        columns = self.bins - 1 - (self.head - bins)
+        # Samples older than the first column are off the map
+        keep = columns >= 0
+        if not keep.all():
+            series_ids, columns, values = series_ids[keep], columns[keep], np.asarray(values)[keep]
+        np.add.at(self._sums, (series_ids, columns), values)
+        np.add.at(self._counts, (series_ids, columns), 1)
+
+    def image(self):
+        """float32 array (series x bins) of mean distances, NaN where a bin is empty."""
+        counts = self._counts[:self.rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self._sums[:self.rows] / counts).astype(np.float32)
+
+    def time_span(self):
+        """(start, end) in ns of the time the columns cover, or None before any sample."""
+        if self.head is None:
+            return None
+        return (self.head + 1 - self.bins) * self.bin_ns, (self.head + 1) * self.bin_ns
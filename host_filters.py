@@ -0,0 +1,148 @@
+"""
+Host-side smoothing of firmware distance series.
+
+A FilterStage sits between parsing and plotting. It takes the firmware
+samples of one type ("RAW" by default) from each batch of records, runs
+them through per-(anchor, device) filters and returns the results as new
+DistanceSamples with their own type strings (HOST_MED, HOST_EMA, HOST_KF),
+stamped with the arrival time of their source sample. Those derived series
+are then stored, plotted, logged and replayed like any firmware series.
+
+Each filter processes a series' samples of a batch in one call: the moving
+median vectorized over the batch, the EMA and the Kalman filter with O(1)
+work per sample. Holds no Qt state, so it runs in the reader thread.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from line_parser import DistanceSample
+from timestamps import NS_PER_S
+
+# Type strings of the derived series start with this
+HOST_PREFIX = "HOST_"
+
+
+class MovingMedian:
+    """Median of the last 'window' samples; spikes shorter than half the window vanish."""
+
+    type_str = "HOST_MED"
+
+    def __init__(self, window=5):
+        self.window = window
+        # The last window - 1 inputs
+        self._history = None
+
+    def process(self, times, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self._history is None:
+            # Start as if the first value had been there all along
+            self._history = np.full(self.window - 1, values[0])
+        data = np.concatenate((self._history, values))
+        self._history = data[len(data) - (self.window - 1):]
+        return np.median(sliding_window_view(data, self.window), axis=1)
+
+
+class ExponentialAverage:
+    """Exponential moving average, y += alpha * (x - y) per sample."""
+
+    type_str = "HOST_EMA"
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self._value = None
+
+    def process(self, times, values):
+        alpha = self.alpha
+        value = self._value
+        out = np.empty(len(values))
+        for i, x in enumerate(np.asarray(values, dtype=np.float64).tolist()):
+            value = x if value is None else value + alpha * (x - value)
+            out[i] = value
+        self._value = value
+        return out
+
+
+class Kalman1D:
+    """
+    Kalman filter for a distance that wanders as a random walk: the state
+    variance grows by 'process_noise' (m^2/s) times the time since the last
+    sample, and each measurement has variance 'measurement_noise' (m^2).
+    Using the arrival times keeps the smoothing right at any sample rate.
+    """
+
+    type_str = "HOST_KF"
+
+    def __init__(self, process_noise=0.05, measurement_noise=0.25):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self._estimate = None
+        self._variance = 0.0
+        self._last_time = None
+
+    def process(self, times, values):
+        q, r = self.process_noise, self.measurement_noise
+        estimate, variance, last_time = self._estimate, self._variance, self._last_time
+        out = np.empty(len(values))
+        for i, (t, x) in enumerate(zip(np.asarray(times).tolist(), np.asarray(values, dtype=np.float64).tolist())):
+            if estimate is None:
+                estimate, variance = x, r
+            else:
+                variance += q * max(t - last_time, 0) / NS_PER_S
+                gain = variance / (variance + r)
+                estimate += gain * (x - estimate)
+                variance *= 1.0 - gain
+            last_time = t
+            out[i] = estimate
+        self._estimate, self._variance, self._last_time = estimate, variance, last_time
+        return out
+
+
+# Derived type string -> filter class
+FILTERS = {cls.type_str: cls for cls in (MovingMedian, ExponentialAverage, Kalman1D)}
+
+
+class FilterStage:
+    """
+    Run the 'enabled' filters (type strings from FILTERS; none by
+    default) over every (anchor, device) series of 'source_type'.
+    'options' maps a type string to keyword arguments for its filter.
+    'enabled' may be replaced from another thread at any time; a filter
+    keeps its state while disabled.
+    """
+
+    def __init__(self, enabled=(), source_type="RAW", options=None):
+        self.enabled = frozenset(enabled)
+        self.source_type = source_type
+        self.options = options or {}
+        # (anchor_id, device_id, derived type) -> filter
+        self._filters = {}
+
+    def process(self, records):
+        """Return the derived DistanceSamples for a batch of records."""
+        enabled = self.enabled
+        if not enabled:
+            return []
+        source_type = self.source_type
+        # (anchor_id, device_id) -> ([times], [values]), in arrival order
+        groups = {}
+        for record in records:
+            if isinstance(record, DistanceSample) and record.type_str == source_type:
+                group = groups.get((record.anchor_id, record.device_id))
+                if group is None:
+                    group = groups[(record.anchor_id, record.device_id)] = ([], [])
+                group[0].append(record.timestamp)
+                group[1].append(record.distance)
+        derived = []
+        for (anchor_id, device_id), (times, values) in groups.items():
+            for type_str in enabled:
+                key = (anchor_id, device_id, type_str)
+                series_filter = self._filters.get(key)
+                if series_filter is None:
+                    series_filter = self._filters[key] = FILTERS[type_str](**self.options.get(type_str, {}))
+                derived.extend(DistanceSample(anchor_id, device_id, type_str, value, timestamp)
+                               for timestamp, value in zip(times, series_filter.process(times, values).tolist()))
+        return derived
+
+    def reset(self):
+        """Forget every filter's state."""
+        self._filters = {}
@@ -0,0 +1,97 @@
+import time
+
+
+class IngestStats:
+    """
+    Health counters for the path from the transport to the plot.
+
+    Each counter has a single writer (the reader thread or the GUI thread),
+    so plain integer updates are safe under the GIL and cost next to
+    nothing. Per-type line counts are read from the attached LineParser's
+    hit counters, and dropped over-long lines from the attached LineFramer,
+    only when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self.parser = None
+        self.framer = None
+        self.reset()
+
+    def reset(self):
+        # Reader thread
+        self.bytes_read = 0
+        self.reads = 0
+        # Read calls, including those that returned nothing
+        self.wakeups = 0
+        self.batches_emitted = 0
+        self.parse_seconds = 0.0
+        self.driver_buffer_full = 0
+        # GUI thread
+        self.batches_handled = 0
+        self.records_handled = 0
+        self.handle_seconds = 0.0
+        # Plot frames drawn, and time spent drawing them
+        self.frames = 0
+        self.render_seconds = 0.0
+        self.started = time.monotonic()
+
+    def attach(self, parser, framer=None):
+        """Take line counts from 'parser' and overflow counts from 'framer'."""
+        self.parser = parser
+        self.framer = framer
+
+    def snapshot(self):
+        """Return a dict of the current totals."""
+        hits = dict(self.parser.hits) if self.parser else {}
+        return {
+            "time": time.monotonic(),
+            "bytes_read": self.bytes_read,
+            "reads": self.reads,
+            "wakeups": self.wakeups,
+            "lines": sum(hits.values()),
+            "lines_by_type": hits,
+            "unmatched_lines": hits.get("unmatched", 0),
+            "overflowed_lines": self.framer.overflow_count if self.framer else 0,
+            "driver_buffer_full": self.driver_buffer_full,
+            "batches_emitted": self.batches_emitted,
+            "batches_handled": self.batches_handled,
+            # Batches queued between the reader and the GUI thread
+            "backlog": self.batches_emitted - self.batches_handled,
+            "records_handled": self.records_handled,
+            "parse_seconds": self.parse_seconds,
+            "handle_seconds": self.handle_seconds,
+            "frames": self.frames,
+            "render_seconds": self.render_seconds,
+        }
+
+
+def rates(previous, current):
+    """Per-second rates between two snapshots."""
+    interval = max(current["time"] - previous["time"], 1e-9)
+    result = {
+        key + "_per_s": (current[key] - previous[key]) / interval
+        for key in ("bytes_read", "reads", "wakeups", "lines", "unmatched_lines", "records_handled", "frames")
+    }
+    result["lines_by_type_per_s"] = {
+        name: (count - previous["lines_by_type"].get(name, 0)) / interval
+        for name, count in current["lines_by_type"].items()
+    }
+    # Share of wall time spent parsing (reader) and handling batches (GUI)
+    result["parse_load"] = (current["parse_seconds"] - previous["parse_seconds"]) / interval
+    result["handle_load"] = (current["handle_seconds"] - previous["handle_seconds"]) / interval
+    result["render_load"] = (current["render_seconds"] - previous["render_seconds"]) / interval
+    return result
+
+
+def format_status(snapshot, rate):
+    """One-line summary for the status bar."""
+    by_type = " ".join(
+        f"{name} {value:,.0f}/s" for name, value in rate["lines_by_type_per_s"].items() if value)
+    return (
+        f"{rate['bytes_read_per_s'] / 1000:,.1f} kB/s | {rate['lines_per_s']:,.0f} lines/s"
+        f"{' (' + by_type + ')' if by_type else ''} | {rate['wakeups_per_s']:,.0f} reads/s"
+        f" | backlog {snapshot['backlog']}"
+        f" | parse {rate['parse_load']:.0%} gui {rate['handle_load']:.0%}"
+        f" render {rate['render_load']:.0%} @ {rate['frames_per_s']:.0f} fps"
+        f" | dropped {snapshot['overflowed_lines']} | rx full {snapshot['driver_buffer_full']}"
+    )
@@ -0,0 +1,27 @@
+"""
+When to draw per-point symbols.
+
+Peak-preserving downsampling and clip-to-view are left on for every curve;
+pyqtgraph only downsamples once there are more points in view than pixels,
+so zooming in brings back every point by itself. Symbols are the other big
+cost: a curve draws them only while few enough of its points are in view.
+"""
+import numpy as np
+
+# Curves with more points than this in view are drawn without symbols
+SYMBOL_POINT_LIMIT = 300
+# Symbols come back below this fraction of the limit, so a curve hovering
+# around the limit does not flicker between the two styles
+SYMBOL_HYSTERESIS = 0.8
+
+
+def visible_points(x, x_min, x_max):
+    """Number of points of an ascending x array inside [x_min, x_max]."""
+    if x is None or not len(x):
+        return 0
+    return int(np.searchsorted(x, x_max, side="right") - np.searchsorted(x, x_min, side="left"))
+
+
+def wants_symbols(showing, visible, limit=SYMBOL_POINT_LIMIT, hysteresis=SYMBOL_HYSTERESIS):
+    """Whether a curve now showing symbols ('showing') should show them with 'visible' points in view."""
+    return visible <= (limit if showing else limit * hysteresis)
@@ -0,0 +1,115 @@
+class LineFramer:
+    """
+    Frame an incoming byte stream into complete lines in a preallocated buffer.
+
+    Bytes are received straight into a fixed bytearray (readinto() from a
+    transport, or write() for byte strings). take_complete() hands out the
+    span of the buffer holding every complete line received so far, one
+    span per read instead of a list of lines. Within the buffer, only
+    the pending, unterminated line is ever moved, back to the front of the
+    buffer when the free tail runs out, and it is capped at max_line_length
+    so a noisy port cannot grow memory without limit.
+    """
+
+    def __init__(self, max_line_length=4096, buffer_size=65536):
+        # Longest unterminated line we keep before discarding it
+        self.max_line_length = max_line_length
+        self.buffer = bytearray(buffer_size + max_line_length)
+        self.view = memoryview(self.buffer)
+        self._start = 0      # First byte of the pending (incomplete) line
+        self._end = 0        # End of received data
+        self._discarding = False
+        # Number of over-long lines that were dropped
+        self.overflow_count = 0
+
+    def free_space(self):
+        """Bytes that can be received before the buffer is full."""
+        return len(self.buffer) - (self._end - self._start)
+
+    def _reserve(self, size):
+        # Make room for 'size' bytes after _end; return how many fit
+        if self._end + size > len(self.buffer):
+            pending = self._end - self._start
+            if pending:
+                # Via a copy, as the regions may overlap; take_complete() keeps
+                # the pending line at most max_line_length bytes
+                self.buffer[:pending] = bytes(self.view[self._start:self._end])
+            self._start, self._end = 0, pending
+        return min(size, len(self.buffer) - self._end)
+
+    def readinto(self, transport, size):
+        """
+        Receive up to 'size' bytes from 'transport' directly into the
+        buffer. Return a memoryview of the new bytes (valid until the next
+        call that receives data).
+        """
+        size = self._reserve(size)
+        end = self._end
+        n = transport.readinto(self.view[end:end + size]) or 0
+        self._end = end + n
+        return self.view[end:end + n]
+
+    def write(self, data):
+        """Copy bytes into the buffer; return how many fitted."""
+        size = self._reserve(len(data))
+        self.buffer[self._end:self._end + size] = data[:size]
+        self._end += size
+        return size
+
+    def take_complete(self):
+        """
+        Return (start, stop) such that buffer[start:stop] holds every
+        complete line received so far, newlines included, and mark them
+        consumed. The span stays valid until the next call that receives
+        data. Return None if no line is complete yet.
+        """
+        start, end = self._start, self._end
+        stop = self.buffer.rfind(b"\n", start, end) + 1
+        if not stop:
+            if end - start > self.max_line_length:
+                self._drop_pending()
+            return None
+        if self._discarding:
+            # Tail of a line that already overflowed
+            self._discarding = False
+            start = self.buffer.find(b"\n", start, stop) + 1
+        if stop == end:
+            # Nothing pending; start over at the front without copying
+            self._start = self._end = 0
+        elif end - stop > self.max_line_length:
+            # The line after the complete ones is already too long
+            self._drop_pending()
+        else:
+            self._start = stop
+        return (start, stop) if start < stop else None
+
+    def _drop_pending(self):
+        # Drop an over-long line; its tail is skipped up to the next newline
+        if not self._discarding:
+            self.overflow_count += 1
+            self._discarding = True
+        self._start = self._end = 0
+
+    def feed(self, data):
+        """
+        Append 'data' and return the complete lines as bytes, without the
+        trailing '\\n'. Convenience for callers that hold byte strings.
+        """
+        lines = []
+        data = memoryview(data)
+        while data:
+            n = self.write(data)
+            data = data[n:]
+            region = self.take_complete()
+            if region:
+                lines.extend(bytes(self.view[region[0]:region[1] - 1]).split(b"\n"))
+        return lines
+
+    def pending(self):
+        """Number of buffered bytes not yet terminated by a newline."""
+        return self._end - self._start
+
+    def reset(self):
+        """Forget any partial line."""
+        self._start = self._end = 0
+        self._discarding = False
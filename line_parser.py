@@ -0,0 +1,158 @@
+import re
+from collections import namedtuple
+
+# Typed records produced from firmware output lines
+DistanceSample = namedtuple("DistanceSample", "anchor_id device_id type_str distance timestamp")
+LocationEvent = namedtuple("LocationEvent", "x y timestamp")
+OemEvent = namedtuple("OemEvent", "line timestamp")
+
+# Patterns work on raw bytes so only the captured fields get converted.
+# location : (x, y)
+LOCATION_RE = re.compile(rb"location\s*:\s*\((-?\d*\.?\d+),\s*(-?\d*\.?\d+)\)", re.IGNORECASE)
+# Anchor 1 Device 2 Distance RAW: 3.45, or the old format without "Device 2"
+DISTANCE_RE = re.compile(rb"Anchor\s+(\d+)\s+(?:Device\s+(\d+)\s+)?Distance\s+(\S+):\s+([\d\.]+)")
+OEM_MARKER = b"Received OEM App Command:"
+
+# Re-sort the classifiers by hit count after this many lines
+REORDER_INTERVAL = 1024
+
+
+class LineParser:
+    """
+    Turn framed lines into DistanceSample, LocationEvent and OemEvent records.
+
+    Each line is classified in a single pass: a cheap keyword test guards
+    every precompiled pattern, so a format's regex only runs on lines that
+    can match it, and the classifiers are kept ordered by their live hit
+    counts so the most frequent format is tried first. A line holding the
+    keywords of several formats is resolved with a fixed priority instead,
+    so the order never changes the result: a location wins over
+    everything else, and an OEM command line that also carries a distance
+    yields both an OemEvent and a DistanceSample.
+
+    Holds no Qt state, so it can run in the reader thread (or anywhere else)
+    and hand the GUI thread records that are ready to plot.
+    """
+
+    def __init__(self, verbose=False):
+        # Print lines that match no known format (debug aid)
+        self.verbose = verbose
+        keywords = {"distance": b"Distance", "location": b"(", "oem": OEM_MARKER}
+        handlers = {"distance": self._parse_distance, "location": self._parse_location, "oem": self._parse_oem}
+        # (name, keyword that must be present, search for any other keyword, handler)
+        self._classifiers = [
+            (name, keyword,
+             re.compile(b"|".join(re.escape(other) for other in keywords.values() if other != keyword)).search,
+             handlers[name])
+            for name, keyword in keywords.items()
+        ]
+        self.hits = {name: 0 for name in keywords}
+        self.hits["unmatched"] = 0
+        # Decoded type strings, so each sample reuses the same str object
+        self._type_names = {}
+        self._reorder()
+
+    def parse_lines(self, lines, timestamp, records=None):
+        """Parse a batch of raw lines (bytes) that arrived at 'timestamp'."""
+        if records is None:
+            records = []
+        append = records.append
+        hits = self.hits
+        classifiers = self._classifiers
+        for line in lines:
+            for name, keyword, other_keyword, handler in classifiers:
+                if keyword in line:
+                    if other_keyword(line) is not None:
+                        if not self._parse_mixed(line, timestamp, append):
+                            self._unmatched(line)
+                        break
+                    record = handler(line, timestamp)
+                    if record is not None:
+                        hits[name] += 1
+                        append(record)
+                        break
+            else:
+                self._unmatched(line)
+        self._until_reorder -= len(lines)
+        if self._until_reorder <= 0:
+            self._reorder()
+        return records
+
+    def parse_line(self, line, timestamp):
+        """Parse one bytes line; return its record or None."""
+        records = self.parse_lines([line], timestamp)
+        return records[0] if records else None
+
+    def parse_region(self, buf, start, stop, timestamp, records=None):
+        """
+        Parse the newline-terminated lines in buf[start:stop], e.g. the span
+        LineFramer.take_complete() returns from its receive buffer. The span
+        is copied into one bytes object and split into one bytes object per
+        line, both in C; only the captured fields are decoded.
+        """
+        lines = bytes(memoryview(buf)[start:stop - 1]).split(b"\n")
+        return self.parse_lines(lines, timestamp, records)
+
+    def _unmatched(self, line):
+        line = line.strip()
+        if not line:
+            return  # skip empty lines
+        self.hits["unmatched"] += 1
+        if self.verbose:
+            print(f"(Debug) No anchor match: {line.decode(errors='ignore')}")
+
+    def _reorder(self):
+        """Sort the classifiers so the most frequent format is tried first."""
+        self._until_reorder = REORDER_INTERVAL
+        self._classifiers.sort(key=lambda c: self.hits[c[0]], reverse=True)
+
+    def _parse_mixed(self, line, timestamp, append):
+        # Several formats' keywords in one line: the original fixed priority
+        hits = self.hits
+        if b"(" in line:
+            record = self._parse_location(line, timestamp)
+            if record is not None:
+                hits["location"] += 1
+                append(record)
+                return True
+        matched = False
+        if OEM_MARKER in line:
+            hits["oem"] += 1
+            append(self._parse_oem(line, timestamp))
+            matched = True
+        if b"Distance" in line:
+            record = self._parse_distance(line, timestamp)
+            if record is not None:
+                hits["distance"] += 1
+                append(record)
+                matched = True
+        return matched
+
+    def _parse_distance(self, line, timestamp):
+        match = DISTANCE_RE.search(line)
+        if match is None:
+            return None
+        anchor, device, type_str, distance = match.groups()
+        try:
+            distance = float(distance)
+        except ValueError:
+            # e.g. "1.2.3" matched the digit/dot class but is not a float
+            return None
+        type_name = self._type_names.get(type_str)
+        if type_name is None:
+            type_name = type_str.decode(errors='ignore')
+            # Bounded, in case line noise produces arbitrary type strings
+            if len(self._type_names) < 256:
+                self._type_names[type_str] = type_name
+        # Default device id if not present
+        return DistanceSample(int(anchor), int(device) if device else 1,
+                              type_name, distance, timestamp)
+
+    def _parse_location(self, line, timestamp):
+        match = LOCATION_RE.search(line)
+        if match is None:
+            return None
+        return LocationEvent(float(match.group(1)), float(match.group(2)), timestamp)
+
+    def _parse_oem(self, line, timestamp):
+        return OemEvent(line.decode(errors='ignore').strip(), timestamp)
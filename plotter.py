@@ -1,45 +1,134 @@
 import sys
 import os
-import datetime
+import shutil
+import threading
+import time
 from PyQt5 import QtWidgets, uic, QtGui, QtCore
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, QMutex, QMutexLocker
 import pyqtgraph as pg
 import serial
 import serial.tools.list_ports
-import re
 from pyqtgraph.exporters import ImageExporter
 
 from gui import Ui_MainWindow  # Replace with your UI class if necessary
 from terminal_text_edit import TerminalTextEdit
+from batch_reader import BatchReader
+from ingest_stats import IngestStats, rates, format_status
+from session_store import SessionStore
+from line_parser import DistanceSample, LocationEvent, OemEvent
+from transports import open_transport
+from session_log import LOG_HEADER, format_store_rows, load_log
+from session_replay import SessionReplayer, load_capture
+from host_filters import FilterStage, HOST_PREFIX
+from series_curves import SeriesCurves
+from level_of_detail import visible_points, wants_symbols
+from segmented_curve import SegmentedCurveItem
+from heatmap import RollingHeatmap
+from timestamps import NS_PER_S, from_seconds, to_wall_ns
+
+# Each session's full history is memory-mapped into its own folder under
+# sessions/ in the user's application data folder (see sessions_dir()).
+# Only the newest SESSION_RETENTION folders are kept; None keeps them all,
+# and 0 keeps sessions in memory only.
+SESSION_RETENTION = 20
+# Per-series statistics table
+STATS_COLUMNS = ("Series", "Over", "N", "Mean", "Std", "Min", "Median", "P95", "P99", "Max", "Rate (Hz)")
+STATS_REFRESH_MS = 500
+# Curves on the plot at once, and seconds without samples before a curve is dropped
+MAX_LIVE_SERIES = 64
+SERIES_IDLE_TIMEOUT = 60.0
+# Quiet time after the last step of the window seconds spin box before the windows are refilled
+WINDOW_SECONDS_DEBOUNCE_MS = 400
+# Plot redraws per second; samples only mark their series dirty in between
+RENDER_FPS = 30
+# Plot range modes: follow the data (re-evaluated every RANGE_REFRESH_MS),
+# fixed y limits with x following, or left to the user's pan and zoom
+RANGE_MODES = ("Auto", "Locked Y", "Manual")
+RANGE_REFRESH_MS = 250
+# Heatmap view: time bins shown, and seconds per bin
+HEATMAP_BINS = 600
+HEATMAP_BIN_SECONDS = 0.1
+# Host filters offered on the toolbar: (derived type string, label)
+HOST_FILTER_ACTIONS = (("HOST_MED", "Median"), ("HOST_EMA", "EMA"), ("HOST_KF", "Kalman"))
 
 # Serial Reader Thread
 class SerialReaderThread(QThread):
-    data_received = pyqtSignal(str)
+    # (parsed records, raw bytes for the terminal)
+    records_received = pyqtSignal(list, bytes)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, serial_port):
+    def __init__(self, serial_port, max_latency=0.02, max_batch_bytes=65536, stats=None, stage=None):
         super().__init__()
         self.serial_port = serial_port
         self.running = False
+        # Frames and parses here so the GUI thread only consumes ready records;
+        # each chunk is timestamped (monotonic_ns) as it arrives, so a busy
+        # GUI delays the plot but never skews the sample times
+        # (host filters run here too, off the GUI thread)
+        self.batch_reader = BatchReader(serial_port, max_latency, max_batch_bytes, stats=stats, stage=stage)
+        self.stats = self.batch_reader.stats
 
     def run(self):
         self.running = True
         while self.running and self.serial_port and self.serial_port.is_open:
             try:
-                # Read up to 64 bytes (can adjust if needed)
-                chunk = self.serial_port.read(64).decode(errors='ignore')
-                if chunk:
-                    # Emit chunk to MainWindow (this may be partial lines)
-                    self.data_received.emit(chunk)
+                batch = self.batch_reader.read_batch()
+                if batch:
+                    self.stats.batches_emitted += 1
+                    self.records_received.emit(*batch)
             except Exception as e:
                 self.error_occurred.emit(str(e))
-                break
+                return
+        if self.running:
+            # The transport closed itself (peer disconnected, end of a
+            # capture file); tell the window so it does not look connected
+            self.error_occurred.emit("Connection closed")
 
     def stop(self):
         self.running = False
 
 
+# Session Replay Thread
+class ReplayThread(QThread):
+    # SerialReaderThread's signature plus the replayer generation of the
+    # batch, so batches queued before a seek or stop can be dropped
+    records_received = pyqtSignal(list, bytes, int)
+
+    def __init__(self, replayer, tick=0.02, max_in_flight=2, stats=None, stage=None):
+        super().__init__()
+        self.replayer = replayer
+        self.stats = stats or IngestStats()
+        # Host filters for sessions that have no derived series of their own
+        self.stage = stage
+        self.running = False
+        # Polling interval (s) for timed playback
+        self.tick = tick
+        # Batches emitted but not yet handled by the GUI; keeps unthrottled
+        # playback from queueing faster than the GUI can draw
+        self.in_flight = threading.Semaphore(max_in_flight)
 
+    def run(self):
+        self.running = True
+        while self.running:
+            if not self.in_flight.acquire(timeout=0.1):
+                continue
+            generation, batch = self.replayer.next_batch(time.monotonic())
+            if batch:
+                if self.stage is not None:
+                    batch = batch + self.stage.process(batch)
+                self.stats.batches_emitted += 1
+                self.records_received.emit(batch, b"", generation)
+            else:
+                self.in_flight.release()
+            if not batch or self.replayer.speed is not None:
+                time.sleep(self.tick)
+
+    def batch_done(self):
+        # Called by the GUI thread once a batch has been plotted
+        self.in_flight.release()
+
+    def stop(self):
+        self.running = False
 
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
@@ -50,9 +139,6 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         # Terminal widget (promoted in Qt Designer)
         self.terminal = self.TerminalTextEdit
 
-        # This buffer will accumulate partial data until we find '\n'
-        self.input_buffer = ""
-
         # Connect send mechanisms for commands
         self.SendButton.clicked.connect(self.send_cmd_text)
         self.CMDtextEdit.returnPressed.connect(self.send_cmd_text)
@@ -61,14 +147,23 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.plotWidget.setBackground('white')
         self.plotWidget.showGrid(x=True, y=True)
         self.plotWidget.setLabel('left', 'Distance (m)')
-        self.plotWidget.setLabel('bottom', 'Measurement count')
+        self.plotWidget.setLabel('bottom', 'Arrival time (s)')
+        # Level of detail: peak-preserving downsampling once there are more
+        # points in view than pixels, and only the points in view are drawn
+        self.plotWidget.setDownsampling(auto=True, mode='peak')
+        self.plotWidget.setClipToView(True)
         legend = self.plotWidget.addLegend()
         if legend is not None:
             for _, label in legend.items:
                 label.setStyleSheet("color: #222222; font-size: 12pt; font-weight: bold;")
 
-        # Dictionary to store data by (anchor_id, type_str)
-        self.plot_data = {}
+        # Seconds of every series to show, or None for the window size slider
+        self.window_seconds = None
+        # Every distance sample of the session, in columns keyed by interned series IDs
+        self.session_store = self.new_session_store()
+        # Plot curves of the live series, capped and pooled
+        self.series_curves = SeriesCurves(self.plotWidget, lambda key: self.anchor_curve_style(*key),
+                                          MAX_LIVE_SERIES, SERIES_IDLE_TIMEOUT)
 
         # Anchor colors keyed by anchor_id
         self.anchor_colors = {
@@ -90,6 +185,10 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             16: 'maroon',
         }
 
+        # Accept transport URLs (tcp://host:port, file:///capture.bin, ...) as well as COM ports
+        self.comPortComboBox.setEditable(True)
+        self.comPortComboBox.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+
         # Setup Baud rate combo box
         self.baudRateComboBox.addItems(['9600', '115200', '921600'])
 
@@ -101,6 +200,9 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         # Serial objects
         self.serial = None
         self.serial_thread = None
+        # Longest time (s) received bytes wait before they are parsed and
+        # plotted; longer means fewer reader wakeups at high baud rates
+        self.read_latency = 0.02
 
         # Logging
         self.is_logging = False
@@ -131,6 +233,9 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.windowSizeSlider.setTickPosition(QtWidgets.QSlider.TicksBelow)
         self.windowSizeSlider.setTickInterval(100)
         self.windowSizeSlider.valueChanged.connect(self.update_window_size)
+        self.session_store.set_window_size(self.windowSizeSlider.value(), refill=False)
+        # Or keep the last N seconds of every series
+        self.setup_view_controls()
 
         # COM port refresh timer
         self.com_ports_refresh_timer = QTimer()
@@ -140,23 +245,49 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         # Initialize COM ports
         self.refresh_com_ports()
 
+        # Ingest health counters, summarized in the status bar
+        self.ingest_stats = IngestStats()
+        self.ingest_status_label = QtWidgets.QLabel()
+        self.statusbar.addPermanentWidget(self.ingest_status_label)
+        self.ingest_snapshot = self.ingest_stats.snapshot()
+        self.ingest_status_timer = QTimer()
+        self.ingest_status_timer.timeout.connect(self.update_ingest_status)
+        self.ingest_status_timer.start(1000)
+
+        # Curves are redrawn by a frame timer, not per batch
+        self.setup_render_scheduler()
+        # and the view range by a slower one
+        self.setup_range_controls()
+
+        # Running statistics per series, in a table next to the plot
+        self.setup_stats_table()
+
+        # Alternate view: every series as a row of one image
+        self.setup_heatmap_view()
+
+        # Host-side filters, run in the reader thread as derived series
+        self.filter_stage = FilterStage()
+        self.setup_filter_controls()
+
+        # Session replay
+        self.replay_thread = None
+        # Bumped by every replay start, seek and stop; batches tagged with
+        # an older one belong to a view that is gone. Batches from
+        # 'replay_first_generation' on come from the current thread and
+        # were counted in the ingest stats since their last reset.
+        self.replay_generation = 0
+        self.replay_first_generation = 0
+        self.setup_replay_controls()
+
         # Optional: create tray icon now (or lazily when needed)
         self.tray_icon = QtWidgets.QSystemTrayIcon(self)
         # Use application icon for notifications (or set your own)
         self.tray_icon.setIcon(self.windowIcon())
 
-    def init_anchor_data(self, anchor_id, device_id, type_str):
+    def anchor_curve_style(self, anchor_id, device_id, type_str):
         """
-        Initialize plot data structures for a new (anchor_id, device_id, type_str).
+        PlotDataItem style for the curve of (anchor_id, device_id, type_str).
         """
-        key = (anchor_id, device_id, type_str)
-        self.plot_data[key] = {
-            "x": [],
-            "y": [],
-            "count": 0,
-            "curve": None
-        }
-
         # Pick color for this anchor (default black), offset for device
         base_colors = list(self.anchor_colors.values())
         color_idx = (anchor_id - 1) % len(base_colors)
@@ -166,15 +297,10 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             color = pg.intColor((color_idx * 5 + device_id) % 16)
         legend_name = f"Anchor_{anchor_id}_Device_{device_id}_{type_str}"
 
-        plot_line = self.plotWidget.plot(
-            pen=color,
-            symbol='o',
-            symbolPen=color,
-            symbolBrush=color,
-            name=legend_name
-        )
-        self.plot_data[key]["curve"] = plot_line
-
+        if type_str.startswith(HOST_PREFIX):
+            # Host-filtered overlay: a plain line over its firmware series
+            return dict(pen=pg.mkPen(color, width=2, style=QtCore.Qt.DashLine), symbol=None, name=legend_name)
+        return dict(pen=color, symbol='o', symbolPen=color, symbolBrush=color, name=legend_name)
 
     def send_cmd_text(self):
         command = self.CMDtextEdit.text()
@@ -182,90 +308,527 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.CMDtextEdit.clear()
             self.send_command(command)
 
-    def handle_serial_data(self, chunk):
-        """Accumulate chunk into input_buffer. Split on newline to get full lines."""
+    def handle_serial_data(self, records, chunk):
+        """Consume a batch of records parsed by the reader thread."""
+        started = time.perf_counter()
         # Write raw chunk to terminal for debugging/visibility
-        self.terminal.append_text(chunk)
-
-        # Accumulate chunk into self.input_buffer
-        self.input_buffer += chunk
-
-        # Process complete lines if we have them
-        while "\n" in self.input_buffer:
-            line, self.input_buffer = self.input_buffer.split("\n", 1)
-            line = line.strip("\r")  # remove trailing carriage return if present
-            line = line.strip()      # remove extra whitespace
-
-            if not line:
-                continue  # skip empty lines
-
-            # Parse location : (x,y) and update region GUI
-            loc_match = re.search(r"location\s*:\s*\((-?\d*\.?\d+),\s*(-?\d*\.?\d+)\)", line, re.IGNORECASE)
-            if loc_match:
-                x = float(loc_match.group(1))
-                y = float(loc_match.group(2))
-                self.update_location_region(x, y)
-                continue
+        if chunk:
+            self.terminal.append_text(chunk.decode(errors='ignore'))
 
-            # Check OEM command lines
-            if "Received OEM App Command:" in line:
-                self.show_oem_notification(line)
-
-            # Try to match with device id: Anchor 1 Device 2 Distance RAW: 3.45
-            match = re.search(r"Anchor\s+(\d+)\s+Device\s+(\d+)\s+Distance\s+(\S+):\s+([\d\.]+)", line)
-            if match:
-                anchor_id = int(match.group(1))
-                device_id = int(match.group(2))
-                type_str = match.group(3)
-                distance_value = float(match.group(4))
-                key = (anchor_id, device_id, type_str)
-                if key not in self.plot_data:
-                    self.init_anchor_data(anchor_id, device_id, type_str)
-                self.plot_data[key]["count"] += 1
-                count_val = self.plot_data[key]["count"]
-                self.plot_data[key]["x"].append(count_val)
-                self.plot_data[key]["y"].append(distance_value)
-                window_size = self.windowSizeSlider.value()
-                if len(self.plot_data[key]["x"]) > window_size:
-                    self.plot_data[key]["x"] = self.plot_data[key]["x"][-window_size:]
-                    self.plot_data[key]["y"] = self.plot_data[key]["y"][-window_size:]
-                curve = self.plot_data[key]["curve"]
-                curve.setData(self.plot_data[key]["x"], self.plot_data[key]["y"])
-                if self.is_logging and self.log_file:
-                    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                    log_line = f"{timestamp},Anchor {anchor_id} Device {device_id} {type_str},{distance_value}\n"
-                    with QMutexLocker(self.log_mutex):
-                        self.log_file.write(log_line)
-                        self.log_file.flush()
-                continue
-            # Fallback: old format (no device id)
-            match = re.search(r"Anchor\s+(\d+)\s+Distance\s+(\S+):\s+([\d\.]+)", line)
-            if match:
-                anchor_id = int(match.group(1))
-                device_id = 1  # Default device id if not present
-                type_str = match.group(2)
-                distance_value = float(match.group(3))
-                key = (anchor_id, device_id, type_str)
-                if key not in self.plot_data:
-                    self.init_anchor_data(anchor_id, device_id, type_str)
-                self.plot_data[key]["count"] += 1
-                count_val = self.plot_data[key]["count"]
-                self.plot_data[key]["x"].append(count_val)
-                self.plot_data[key]["y"].append(distance_value)
-                window_size = self.windowSizeSlider.value()
-                if len(self.plot_data[key]["x"]) > window_size:
-                    self.plot_data[key]["x"] = self.plot_data[key]["x"][-window_size:]
-                    self.plot_data[key]["y"] = self.plot_data[key]["y"][-window_size:]
-                curve = self.plot_data[key]["curve"]
-                curve.setData(self.plot_data[key]["x"], self.plot_data[key]["y"])
-                if self.is_logging and self.log_file:
-                    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                    log_line = f"{timestamp},Anchor {anchor_id} Device {device_id} {type_str},{distance_value}\n"
-                    with QMutexLocker(self.log_mutex):
-                        self.log_file.write(log_line)
-                        self.log_file.flush()
+        samples = []
+        for record in records:
+            if isinstance(record, DistanceSample):
+                samples.append(record)
+            elif isinstance(record, LocationEvent):
+                # Parse location : (x,y) and update region GUI
+                self.update_location_region(record.x, record.y)
+            elif isinstance(record, OemEvent):
+                self.show_oem_notification(record.line)
+        if samples:
+            self.add_distance_samples(samples)
+
+        stats = self.ingest_stats
+        stats.batches_handled += 1
+        stats.records_handled += len(records)
+        stats.handle_seconds += time.perf_counter() - started
+
+    def reset_ingest_stats(self):
+        self.ingest_stats.reset()
+        # Replay batches still queued were counted before the reset
+        self.replay_first_generation = self.replay_generation + 1
+        self.ingest_stats.attach(None)
+        self.ingest_snapshot = self.ingest_stats.snapshot()
+
+    def update_ingest_status(self):
+        snapshot = self.ingest_stats.snapshot()
+        store = self.session_store
+        # Persist the row count, so a crash loses at most the last second
+        store.save_meta()
+        # Drop the curves of series that went quiet
+        self.series_curves.expire(store.newest_time)
+        self.ingest_status_label.setText(
+            format_status(snapshot, rates(self.ingest_snapshot, snapshot))
+            + f" | {store.size:,} samples in {len(store.registry)} series ({len(self.series_curves)} plotted)"
+            + ("" if store.directory else " | in memory")
+            + (f" | disk error: {store.disk_error}" if store.disk_error else ""))
+        self.ingest_snapshot = snapshot
+
+    def add_distance_samples(self, samples):
+        """Store a batch of distance samples, mark the series they touch for redraw and log them."""
+        store = self.session_store
+        start = store.size
+        # Drawn by the next frame, however many batches arrive before it
+        self.dirty_series.update(store.append(samples))
+        self.heatmap.add(store.series_id[start:store.size], store.timestamp[start:store.size],
+                         store.distance[start:store.size])
+        self.heatmap_dirty = True
+        if self.is_logging and self.log_file:
+            # Stamped with the arrival time from the reader thread, not the time we got here
+            log_text = format_store_rows(store, start, store.size)
+            with QMutexLocker(self.log_mutex):
+                self.log_file.write(log_text)
+                self.log_file.flush()
+
+    def setup_render_scheduler(self):
+        """Redraw the dirty series at a fixed frame rate."""
+        # Series IDs whose window changed since the last frame
+        self.dirty_series = set()
+        # The visible x range moved, so symbol decisions may change
+        self.view_changed = False
+        self.plotWidget.sigXRangeChanged.connect(self.mark_view_changed)
+        self.render_timer = QTimer()
+        self.render_timer.timeout.connect(self.render_frame)
+        self.set_render_fps(RENDER_FPS)
+
+    def set_render_fps(self, fps):
+        self.render_timer.start(max(1, round(1000 / fps)))
+
+    def mark_all_dirty(self):
+        self.dirty_series.update(self.series_curves.live)
+
+    def sample_clock(self):
+        """
+        The current time on the sample timeline (int ns): playback position
+        while replaying, arrival time while reading, None when stopped.
+        """
+        if self.replay_thread:
+            replayer = self.replay_thread.replayer
+            return from_seconds(replayer.start_time + replayer.elapsed(time.monotonic()))
+        if self.serial_thread:
+            return to_wall_ns(time.monotonic_ns())
+        return None
+
+    def mark_view_changed(self, *_args):
+        self.view_changed = True
+
+    def render_frame(self):
+        if self.heatmap_view:
+            self.render_heatmap()
+            return
+        view_changed, self.view_changed = self.view_changed, False
+        if not self.dirty_series and not view_changed:
+            return
+        started = time.perf_counter()
+        dirty, self.dirty_series = self.dirty_series, set()
+        for series_id in sorted(dirty):
+            self.update_series_curve(series_id)
+        live = self.series_curves.live
+        x_range = self.plotWidget.viewRange()[0]
+        for series_id in (list(live) if view_changed else dirty):
+            if series_id in live:
+                self.apply_level_of_detail(series_id, live[series_id], x_range)
+        stats = self.ingest_stats
+        stats.frames += 1
+        stats.render_seconds += time.perf_counter() - started
+
+    def update_series_curve(self, series_id):
+        store = self.session_store
+        curves = self.series_curves
+        last_time = store.session_stats[series_id].last_time
+        if last_time is None or curves.is_idle(last_time, store.newest_time):
+            # Nothing to show (or only stale samples); the rows stay in the store
+            curves.release(series_id)
+            return
+        curve = curves.acquire(series_id, store.registry.keys[series_id], last_time, store.newest_time)
+        if curve is None:
+            return  # over the curve cap; plotted once a slot frees up
+        curve.setData(*store.series_window(series_id))
+
+    def setup_heatmap_view(self):
+        """A heatmap of all series (rows) over time, shown instead of the line plot."""
+        self.heatmap = RollingHeatmap(HEATMAP_BINS, HEATMAP_BIN_SECONDS)
+        self.heatmap_view = False
+        self.heatmap_dirty = False
+        # Series rows the axis is labelled for
+        self.heatmap_labelled_rows = 0
+        self.heatmapWidget = pg.PlotWidget()
+        self.heatmapWidget.setBackground('white')
+        self.heatmapWidget.setLabel('left', 'Series')
+        self.heatmapWidget.setLabel('bottom', 'Arrival time (s)')
+        self.heatmap_image = pg.ImageItem(axisOrder='row-major')
+        self.heatmap_image.setLookupTable(pg.colormap.get('viridis').getLookupTable())
+        self.heatmapWidget.addItem(self.heatmap_image)
+        self.heatmapWidget.hide()
+        self.plot_splitter.insertWidget(1, self.heatmapWidget)
+        self.heatmapAction = self.viewToolBar.addAction("Heatmap", self.toggle_heatmap)
+        self.heatmapAction.setCheckable(True)
+        self.heatmapAction.setToolTip("Show every series as a row of one image (colour = distance)")
+
+    def toggle_heatmap(self):
+        self.heatmap_view = self.heatmapAction.isChecked()
+        self.heatmapWidget.setVisible(self.heatmap_view)
+        self.plotWidget.setVisible(not self.heatmap_view)
+        if self.heatmap_view:
+            self.heatmap_dirty = True
+        else:
+            # Curves were not updated while hidden, and series that
+            # appeared meanwhile have no curve yet
+            self.dirty_series.update(range(len(self.session_store.registry)))
+
+    def render_heatmap(self):
+        # Curves stay hidden; they catch up when the line view comes back
+        self.dirty_series.clear()
+        # Scroll with the clock, also while no series reports
+        now = self.sample_clock()
+        if now is not None and self.heatmap.advance(now):
+            self.heatmap_dirty = True
+        if not self.heatmap_dirty:
+            return
+        started = time.perf_counter()
+        self.heatmap_dirty = False
+        heatmap = self.heatmap
+        store = self.session_store
+        span = heatmap.time_span()
+        if span is None or not heatmap.rows:
+            self.heatmap_image.clear()
+            return
+        # Colour scale from the running min/max, without scanning the image
+        stats = [series for series in store.session_stats[:heatmap.rows] if series.count]
+        low = min(series.min for series in stats)
+        high = max(max(series.max for series in stats), low + 1e-3)
+        # One texture upload per frame, whatever the number of series
+        self.heatmap_image.setImage(heatmap.image(), autoLevels=False, levels=(low, high))
+        start, end = span
+        self.heatmap_image.setRect(QtCore.QRectF(
+            (start - store.time_origin) / NS_PER_S, 0, (end - start) / NS_PER_S, heatmap.rows))
+        if heatmap.rows != self.heatmap_labelled_rows:
+            self.heatmap_labelled_rows = heatmap.rows
+            self.heatmapWidget.getAxis('left').setTicks([[
+                (row + 0.5, "A{} D{} {}".format(*key))
+                for row, key in enumerate(store.registry.keys[:heatmap.rows])]])
+        ingest = self.ingest_stats
+        ingest.frames += 1
+        ingest.render_seconds += time.perf_counter() - started
+
+    def apply_level_of_detail(self, series_id, curve, x_range):
+        """Draw per-point symbols only while few points of the curve are in view."""
+        if not isinstance(curve, pg.PlotDataItem):
+            return  # segmented curves are drawn as lines only
+        symbol = self.anchor_curve_style(*self.session_store.registry.keys[series_id])['symbol']
+        if symbol is None:
+            return
+        showing = curve.opts['symbol'] is not None
+        show = wants_symbols(showing, visible_points(curve.xData, *x_range))
+        if show != showing:
+            curve.setSymbol(symbol if show else None)
+
+    def setup_stats_table(self):
+        """Table of per-series statistics, sharing a splitter with the plot."""
+        self.stats_table = QtWidgets.QTableWidget(0, len(STATS_COLUMNS))
+        self.stats_table.setHorizontalHeaderLabels(STATS_COLUMNS)
+        self.stats_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
+        splitter = self.plot_splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
+        self.gridLayout_2.removeWidget(self.plotWidget)
+        splitter.addWidget(self.plotWidget)
+        splitter.addWidget(self.stats_table)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+        self.gridLayout_2.addWidget(splitter, 0, 3, 3, 2)
+        # Statistics are kept up to date as samples arrive; the table only
+        # copies them out at this low fixed rate
+        self.stats_table_timer = QTimer()
+        self.stats_table_timer.timeout.connect(self.update_stats_table)
+        self.stats_table_timer.start(STATS_REFRESH_MS)
+
+    def update_stats_table(self):
+        store = self.session_store
+        table = self.stats_table
+        rows = 2 * len(store.window_stats)
+        if table.rowCount() != rows:
+            table.setRowCount(rows)
+            for row in range(rows):
+                for column in range(len(STATS_COLUMNS)):
+                    if table.item(row, column) is None:
+                        table.setItem(row, column, QtWidgets.QTableWidgetItem())
+        for series_id, key in enumerate(store.registry.keys[:len(store.window_stats)]):
+            name = "A{} D{} {}".format(*key)
+            for offset, scope, stats in ((0, "window", store.window_stats[series_id]),
+                                         (1, "session", store.session_stats[series_id])):
+                summary = stats.summary()
+                values = (name, scope, f"{summary['count']:,}", f"{summary['mean']:.3f}",
+                          f"{summary['std']:.3f}", f"{summary['min']:.3f}", f"{summary['p50']:.3f}",
+                          f"{summary['p95']:.3f}", f"{summary['p99']:.3f}", f"{summary['max']:.3f}",
+                          f"{summary['rate']:.1f}")
+                for column, text in enumerate(values):
+                    table.item(2 * series_id + offset, column).setText(text)
+
+    def setup_view_controls(self):
+        """Toolbar choosing a point-count or a time window for every series."""
+        toolbar = self.viewToolBar = self.addToolBar("View")
+        toolbar.setObjectName("viewToolBar")
+        toolbar.addWidget(QtWidgets.QLabel("Window: "))
+        self.windowModeComboBox = QtWidgets.QComboBox()
+        self.windowModeComboBox.addItems(["Points", "Seconds"])
+        toolbar.addWidget(self.windowModeComboBox)
+        self.windowSecondsSpinBox = QtWidgets.QDoubleSpinBox()
+        self.windowSecondsSpinBox.setRange(1.0, 3600.0)
+        self.windowSecondsSpinBox.setValue(30.0)
+        self.windowSecondsSpinBox.setSuffix(" s")
+        self.windowSecondsSpinBox.setEnabled(False)
+        toolbar.addWidget(self.windowSecondsSpinBox)
+        self.windowModeComboBox.currentTextChanged.connect(self.update_window_mode)
+        # Refilling every window walks the history, so wait until the
+        # value has settled rather than refilling on every step
+        self.window_seconds_timer = QTimer()
+        self.window_seconds_timer.setSingleShot(True)
+        self.window_seconds_timer.setInterval(WINDOW_SECONDS_DEBOUNCE_MS)
+        self.window_seconds_timer.timeout.connect(self.update_window_mode)
+        self.windowSecondsSpinBox.valueChanged.connect(self.window_seconds_timer.start)
+        self.windowSecondsSpinBox.editingFinished.connect(self.apply_window_seconds)
+        toolbar.addSeparator()
+        toolbar.addWidget(QtWidgets.QLabel("Max curves: "))
+        self.maxCurvesSpinBox = QtWidgets.QSpinBox()
+        self.maxCurvesSpinBox.setRange(1, 1000)
+        self.maxCurvesSpinBox.setValue(self.series_curves.max_live)
+        self.maxCurvesSpinBox.setToolTip("Least recently active series beyond this are taken off the plot")
+        self.maxCurvesSpinBox.valueChanged.connect(self.series_curves.set_max_live)
+        toolbar.addWidget(self.maxCurvesSpinBox)
+        toolbar.addWidget(QtWidgets.QLabel(" FPS: "))
+        self.renderFpsComboBox = QtWidgets.QComboBox()
+        self.renderFpsComboBox.addItems(['10', '15', '30', '60'])
+        self.renderFpsComboBox.setCurrentText(str(RENDER_FPS))
+        self.renderFpsComboBox.currentTextChanged.connect(lambda text: self.set_render_fps(int(text)))
+        toolbar.addWidget(self.renderFpsComboBox)
+        self.segmentedAction = toolbar.addAction("Segmented", self.update_curve_type)
+        self.segmentedAction.setCheckable(True)
+        self.segmentedAction.setToolTip(
+            "Draw curves from cached history segments plus a live tail (lines only); "
+            "cheaper for long windows")
+
+    def setup_range_controls(self):
+        """
+        Take the view range away from pyqtgraph's auto-range, which
+        recomputes the data bounds on every setData, and set it at a low
+        fixed rate from the window min/max the session store keeps anyway.
+        """
+        self.plotWidget.disableAutoRange()
+        # Its "A" button would switch the per-update auto-range back on
+        self.plotWidget.hideButtons()
+        toolbar = self.viewToolBar
+        toolbar.addSeparator()
+        toolbar.addWidget(QtWidgets.QLabel("Range: "))
+        self.rangeModeComboBox = QtWidgets.QComboBox()
+        self.rangeModeComboBox.addItems(RANGE_MODES)
+        self.rangeModeComboBox.currentTextChanged.connect(self.update_range_mode)
+        toolbar.addWidget(self.rangeModeComboBox)
+        self.rangeMinSpinBox = QtWidgets.QDoubleSpinBox()
+        self.rangeMaxSpinBox = QtWidgets.QDoubleSpinBox()
+        for spin_box, value in ((self.rangeMinSpinBox, 0.0), (self.rangeMaxSpinBox, 10.0)):
+            spin_box.setRange(-1000.0, 1000.0)
+            spin_box.setValue(value)
+            spin_box.setSuffix(" m")
+            spin_box.setEnabled(False)
+            toolbar.addWidget(spin_box)
+        # Panning or zooming by hand leaves the range to the user
+        self.plotWidget.getViewBox().sigRangeChangedManually.connect(
+            lambda _mask: self.rangeModeComboBox.setCurrentText("Manual"))
+        self.range_timer = QTimer()
+        self.range_timer.timeout.connect(self.update_plot_range)
+        self.range_timer.start(RANGE_REFRESH_MS)
+
+    def update_range_mode(self, mode):
+        locked = mode == "Locked Y"
+        self.rangeMinSpinBox.setEnabled(locked)
+        self.rangeMaxSpinBox.setEnabled(locked)
+        self.update_plot_range()
+
+    def update_plot_range(self):
+        mode = self.rangeModeComboBox.currentText()
+        if mode == "Manual":
+            return
+        store = self.session_store
+        stats = [store.window_stats[series_id] for series_id in self.series_curves.live
+                 if series_id < len(store.window_stats)]
+        stats = [window for window in stats if window.count]
+        if not stats:
+            return
+        origin = store.time_origin
+        x_range = ((min(window.first_time for window in stats) - origin) / NS_PER_S,
+                   (max(window.last_time for window in stats) - origin) / NS_PER_S)
+        if mode == "Locked Y":
+            y_range = (self.rangeMinSpinBox.value(), self.rangeMaxSpinBox.value())
+        else:
+            y_range = (min(window.min for window in stats), max(window.max for window in stats))
+        self.plotWidget.setRange(xRange=x_range, yRange=y_range, padding=0.02)
+
+    def update_curve_type(self):
+        factory = SegmentedCurveItem if self.segmentedAction.isChecked() else None
+        self.series_curves.set_factory(factory)
+        # Bring every series back with the new curve type
+        self.dirty_series.update(range(len(self.session_store.window_stats)))
+
+    def apply_window_seconds(self):
+        # Enter or focus out: apply a pending change right away
+        if self.window_seconds_timer.isActive():
+            self.window_seconds_timer.stop()
+            self.update_window_mode()
+
+    def update_window_mode(self, _value=None):
+        self.window_seconds_timer.stop()
+        seconds = None
+        if self.windowModeComboBox.currentText() == "Seconds":
+            seconds = self.windowSecondsSpinBox.value()
+        self.window_seconds = seconds
+        self.windowSecondsSpinBox.setEnabled(seconds is not None)
+        self.windowSizeSlider.setEnabled(seconds is None)
+        self.session_store.set_window_seconds(seconds)
+        self.mark_all_dirty()
+
+    def setup_filter_controls(self):
+        """Toolbar of host filters, each adding a derived series per RAW series."""
+        toolbar = self.addToolBar("Filters")
+        toolbar.setObjectName("filterToolBar")
+        toolbar.addWidget(QtWidgets.QLabel("Host filters: "))
+        self.filter_actions = {}
+        for type_str, label in HOST_FILTER_ACTIONS:
+            action = toolbar.addAction(label, self.update_host_filters)
+            action.setCheckable(True)
+            action.setChecked(type_str in self.filter_stage.enabled)
+            action.setToolTip(f"Plot and log {type_str} next to each RAW series")
+            self.filter_actions[type_str] = action
+
+    def update_host_filters(self):
+        # A single assignment, so the reader thread sees the old or the new set
+        self.filter_stage.enabled = frozenset(
+            type_str for type_str, action in self.filter_actions.items() if action.isChecked())
+
+    def setup_replay_controls(self):
+        """Toolbar for replaying saved logs and raw captures."""
+        toolbar = self.addToolBar("Replay")
+        toolbar.setObjectName("replayToolBar")
+        self.replayOpenAction = toolbar.addAction("Replay...", self.toggle_replay)
+        self.replayPauseAction = toolbar.addAction("Pause", self.toggle_replay_pause)
+        self.replaySpeedComboBox = QtWidgets.QComboBox()
+        self.replaySpeedComboBox.addItems(['1x', '2x', '5x', '10x', '100x', 'Max'])
+        self.replaySpeedComboBox.currentTextChanged.connect(self.update_replay_speed)
+        toolbar.addWidget(self.replaySpeedComboBox)
+        self.replaySeekSlider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.replaySeekSlider.setRange(0, 1000)
+        self.replaySeekSlider.setMinimumWidth(300)
+        self.replaySeekSlider.sliderReleased.connect(self.seek_replay)
+        toolbar.addWidget(self.replaySeekSlider)
+        self.set_replay_controls_enabled(False)
+
+        # Progress and sustained sample rate in the status bar
+        self.replay_samples = 0
+        self.replay_status_timer = QTimer()
+        self.replay_status_timer.timeout.connect(self.update_replay_status)
+
+    def set_replay_controls_enabled(self, enabled):
+        self.replayPauseAction.setEnabled(enabled)
+        self.replaySeekSlider.setEnabled(enabled)
+        self.replayOpenAction.setText("Stop replay" if enabled else "Replay...")
+
+    def replay_speed(self):
+        text = self.replaySpeedComboBox.currentText()
+        return None if text == 'Max' else float(text.rstrip('x'))
+
+    def toggle_replay(self):
+        if self.replay_thread:
+            self.stop_replay()
+            return
+        if self.serial_thread:
+            QtWidgets.QMessageBox.warning(self, "Warning", "Stop the serial port before replaying a session.")
+            return
+        filename, selected_filter = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Replay Session", "",
+            "Log Files (*.log *.txt *.csv);;Raw Captures (*.bin *.raw);;All Files (*)"
+        )
+        if not filename:
+            return
+        # A log already holds the host series it was recorded with
+        stage = None
+        try:
+            if selected_filter.startswith("Raw") or os.path.splitext(filename)[1].lower() in ('.bin', '.raw'):
+                records = load_capture(filename, int(self.baudRateComboBox.currentText()))
+                stage = self.filter_stage
             else:
-                print(f"(Debug) No anchor match: {line}")
+                records = load_log(filename)
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self, "Error", f"Could not load session: {str(e)}")
+            return
+        if not records:
+            QtWidgets.QMessageBox.warning(self, "Warning", "No samples found in this session.")
+            return
+
+        self.clear_plot()
+        self.reset_ingest_stats()
+        self.filter_stage.reset()
+        self.replay_generation += 1
+        self.replay_first_generation = self.replay_generation
+        replayer = SessionReplayer(records, self.replay_speed())
+        replayer.generation = self.replay_generation
+        self.replay_thread = ReplayThread(replayer, stats=self.ingest_stats, stage=stage)
+        self.replay_thread.records_received.connect(self.handle_replay_data)
+        self.replay_thread.start()
+        self.StartButton.setEnabled(False)
+        self.set_replay_controls_enabled(True)
+        self.replay_samples = 0
+        self.replay_rate_mark = (time.monotonic(), 0)
+        self.replay_status_timer.start(500)
+
+    def stop_replay(self):
+        if self.replay_thread:
+            self.replay_thread.stop()
+            self.replay_thread.wait()
+            self.replay_thread = None
+        # Batches still queued for the stopped replay are dropped
+        self.replay_generation += 1
+        self.replay_status_timer.stop()
+        self.replayPauseAction.setText("Pause")
+        self.set_replay_controls_enabled(False)
+        self.StartButton.setEnabled(True)
+        self.statusbar.clearMessage()
+
+    def handle_replay_data(self, records, chunk, generation):
+        if generation == self.replay_generation:
+            self.handle_serial_data(records, chunk)
+            self.replay_samples += len(records)
+        elif generation >= self.replay_first_generation:
+            # Dropped, but emitted since the stats were reset: count it as
+            # handled so the backlog does not stay inflated
+            self.ingest_stats.batches_handled += 1
+        # Stale batches of the running thread still free their slot
+        if self.replay_thread and generation >= self.replay_first_generation:
+            self.replay_thread.batch_done()
+
+    def toggle_replay_pause(self):
+        replayer = self.replay_thread.replayer
+        if replayer.paused:
+            replayer.resume(time.monotonic())
+            self.replayPauseAction.setText("Pause")
+        else:
+            replayer.pause(time.monotonic())
+            self.replayPauseAction.setText("Resume")
+
+    def update_replay_speed(self, _text):
+        if self.replay_thread:
+            self.replay_thread.replayer.set_speed(self.replay_speed(), time.monotonic())
+
+    def seek_replay(self):
+        replayer = self.replay_thread.replayer
+        # Start the view afresh at the new position
+        self.session_store.clear()
+        self.reset_plot_view()
+        # Batches selected before the seek are dropped when they arrive
+        self.replay_generation += 1
+        replayer.seek(replayer.duration * self.replaySeekSlider.value() / 1000.0, time.monotonic(),
+                      self.replay_generation)
+
+    def update_replay_status(self):
+        replayer = self.replay_thread.replayer
+        now = time.monotonic()
+        mark_time, mark_samples = self.replay_rate_mark
+        rate = (self.replay_samples - mark_samples) / max(now - mark_time, 1e-9)
+        self.replay_rate_mark = (now, self.replay_samples)
+        elapsed = replayer.elapsed(now)
+        if replayer.duration > 0 and not self.replaySeekSlider.isSliderDown():
+            self.replaySeekSlider.setValue(int(1000 * elapsed / replayer.duration))
+        state = "finished" if replayer.finished else ("paused" if replayer.paused else self.replaySpeedComboBox.currentText())
+        self.statusbar.showMessage(
+            f"Replay {elapsed:.1f} / {replayer.duration:.1f} s ({state}) - GUI sustained {rate:,.0f} samples/s")
 
     def show_oem_notification(self, line):
         """
@@ -318,10 +881,16 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             if port != 'None':
                 try:
                     baud = int(self.baudRateComboBox.currentText())
-                    self.serial = serial.Serial(port, baud, timeout=0.1)
+                    # Serial port, or a tcp://, pipe://, file:// ... transport
+                    self.serial = open_transport(port, baud, timeout=0.1)
+                    if hasattr(self.serial, "slave_name"):
+                        self.terminal.append_text(f"Listening on pty {self.serial.slave_name}\n")
 
-                    self.serial_thread = SerialReaderThread(self.serial)
-                    self.serial_thread.data_received.connect(self.handle_serial_data)
+                    self.reset_ingest_stats()
+                    self.filter_stage.reset()
+                    self.serial_thread = SerialReaderThread(self.serial, self.read_latency, stats=self.ingest_stats,
+                                                            stage=self.filter_stage)
+                    self.serial_thread.records_received.connect(self.handle_serial_data)
                     self.serial_thread.error_occurred.connect(self.handle_serial_error)
                     self.serial_thread.start()
 
@@ -350,18 +919,69 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.comPortComboBox.setEnabled(True)
         self.baudRateComboBox.setEnabled(True)
 
-        # Clear out any leftover data in buffer
-        self.input_buffer = ""
-
 
     def clear_terminal(self):
         self.terminal.clear()
+    def sessions_dir(self):
+        """
+        The folder holding the session folders, created if needed, or None
+        if sessions are kept in memory (disabled, or the folder is unusable).
+        """
+        if SESSION_RETENTION == 0:
+            return None
+        root = os.path.join(
+            QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.AppDataLocation), "sessions")
+        try:
+            os.makedirs(root, exist_ok=True)
+        except OSError as e:
+            print(f"Keeping sessions in memory: cannot create {root}: {e}")
+            return None
+        return root
+
+    def prune_sessions(self, root):
+        """Delete the oldest session folders, leaving room for one more within SESSION_RETENTION."""
+        if SESSION_RETENTION is None:
+            return
+        # Folder names start with the start time, so they sort by age
+        sessions = sorted(
+            name for name in os.listdir(root)
+            if os.path.isfile(os.path.join(root, name, "session.json"))
+            or (os.path.isdir(os.path.join(root, name)) and not os.listdir(os.path.join(root, name))))
+        for name in sessions[:max(0, len(sessions) - (SESSION_RETENTION - 1))]:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def new_session_store(self):
+        """A disk-backed store in a fresh session folder, or an in-memory one."""
+        window_size = self.windowSizeSlider.value()
+        root = self.sessions_dir()
+        directory = None
+        if root is not None:
+            self.prune_sessions(root)
+            name = time.strftime("%Y%m%d-%H%M%S")
+            directory = os.path.join(root, name)
+            suffix = 1
+            while os.path.exists(directory):
+                suffix += 1
+                directory = os.path.join(root, f"{name}-{suffix}")
+        store = SessionStore(window_size, directory=directory)
+        store.set_window_seconds(self.window_seconds)
+        return store
+
     def clear_plot(self):
-        self.plot_data.clear()
+        # Keep the finished session on disk and start a new one
+        self.session_store.close()
+        self.session_store = self.new_session_store()
+        self.reset_plot_view()
+
+    def reset_plot_view(self):
+        self.series_curves.clear()
+        # Series IDs of the old store mean nothing in the new one
+        self.dirty_series.clear()
+        self.heatmap.clear()
+        self.heatmap_dirty = True
         self.plotWidget.clear()
-        self.plotWidget.addLegend()
         # Make legend font darker and bold
-        legend = self.plotWidget.legend
+        legend = self.plotWidget.addLegend()
         if legend is not None:
             for _, label in legend.items:
                 label.setStyleSheet("color: #222222; font-size: 12pt; font-weight: bold;")
@@ -402,7 +1022,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
                 try:
                     self.log_file = open(log_filename, 'a')
-                    self.log_file.write("Timestamp,Anchor_Type,Distance\n")
+                    self.log_file.write(LOG_HEADER)
                     self.is_logging = True
                     self.LogButton.setText("Stop Logging")
                 except Exception as e:
@@ -423,24 +1043,28 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         current_ports = [port.device for port in serial.tools.list_ports.comports()]
         current_ports.insert(0, 'None')
         if self.comPortComboBox.isEnabled():
+            listed = [self.comPortComboBox.itemText(i) for i in range(self.comPortComboBox.count())]
+            if listed == current_ports:
+                return  # Nothing changed; don't disturb a URL being typed
             prev_sel = self.comPortComboBox.currentText()
             self.comPortComboBox.clear()
             self.comPortComboBox.addItems(current_ports)
             if prev_sel in current_ports:
                 idx = self.comPortComboBox.findText(prev_sel)
                 self.comPortComboBox.setCurrentIndex(idx)
+            elif prev_sel and prev_sel not in listed:
+                # Keep a typed transport URL
+                self.comPortComboBox.setEditText(prev_sel)
             else:
                 self.comPortComboBox.setCurrentIndex(0)
 
     def update_window_size(self, value):
         """
-        Trim anchor data sets to 'value' points and redraw.
+        Resize the series windows to 'value' points and redraw.
         """
-        for key, anchor_dict in self.plot_data.items():
-            if len(anchor_dict["x"]) > value:
-                anchor_dict["x"] = anchor_dict["x"][-value:]
-                anchor_dict["y"] = anchor_dict["y"][-value:]
-            anchor_dict["curve"].setData(anchor_dict["x"], anchor_dict["y"])
+        # Only the view changes; the history stays in the session store
+        self.session_store.set_window_size(value)
+        self.mark_all_dirty()
 
     def send_command(self, command):
         if self.serial and self.serial.is_open:
@@ -455,9 +1079,11 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         else:
             QtWidgets.QMessageBox.warning(self, "Warning", "Serial port is not open.")
     def closeEvent(self, event):
+        self.stop_replay()
         self.stop_serial()
         if self.log_file:
             self.log_file.close()
+        self.session_store.close()
         event.accept()
 
     def update_location_region(self, x, y):
@@ -512,6 +1138,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
 if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
+    # Names the application data folder the sessions are kept in
+    app.setApplicationName("DistancePlotter")
     window = MainWindow()
     window.show()
     sys.exit(app.exec_())
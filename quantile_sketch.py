@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles of positive values in a fixed number of log-spaced
+    bins (a DDSketch-style histogram).
+
+    Bin i > 0 holds the values in (min_value * g**(i - 1), min_value * g**i]
+    with g = (1 + a) / (1 - a), so any quantile is returned within a relative
+    error 'a' of the true one. Values at or below 'min_value' (zero, or the
+    odd negative) share bin 0 and read back as 0; values above 'max_value'
+    share the last bin. The bins never change, so memory per sketch is
+    constant, a batch is one bincount, and samples can be subtracted again
+    exactly when they leave a sliding window.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3, max_value=1e4):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self.bins = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 2
+        # Value each bin reads back as: the point with equal relative error to both edges
+        upper = min_value * np.exp(np.arange(self.bins) * self._log_gamma)
+        self._values = 2 * upper / (gamma + 1)
+        self._values[0] = 0.0
+        self._values[-1] = max_value
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.count = 0
+
+    def _bin_counts(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = np.ceil(np.log(values / self.min_value) / self._log_gamma)
+        index = np.nan_to_num(index, nan=0.0, neginf=0.0, posinf=self.bins - 1)
+        index = np.clip(index, 0, self.bins - 1).astype(np.intp)
+        return np.bincount(index, minlength=self.bins)
+
+    def add_many(self, values):
+        if len(values):
+            self.counts += self._bin_counts(values)
+            self.count += len(values)
+
+    def remove_many(self, values):
+        """Subtract values added earlier (e.g. samples leaving a window)."""
+        if len(values):
+            self.counts -= self._bin_counts(values)
+            self.count -= len(values)
+
+    def quantiles(self, qs):
+        """Estimates for each fraction in 'qs' (0.5 = median); NaN while empty."""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count <= 0:
+            return np.full(qs.shape, math.nan)
+        ranks = np.clip(qs, 0.0, 1.0) * (self.count - 1)
+        index = np.searchsorted(np.cumsum(self.counts), ranks, side='right')
+        return self._values[np.minimum(index, self.bins - 1)]
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def clear(self):
+        self.counts[:] = 0
+        self.count = 0
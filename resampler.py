@@ -0,0 +1,190 @@
+"""
+Align distance series on a common time grid.
+
+resample() puts one series onto a grid of timestamps with nearest, linear
+or hold-last interpolation, in a few vectorized NumPy passes.
+align_session() does it for a whole SessionStore at once; SeriesAligner
+does it incrementally, returning only the grid columns that became final
+since its last call. Both return (grid, matrix): the int64 nanosecond grid
+and a float64 matrix with one row per series and one column per grid
+point, NaN where a series has no usable sample.
+
+Meant for offline analysis of a recorded session (cross-anchor
+comparison, localization inputs) and for 'python bench.py align'; the
+GUI does not call it, so it only depends on NumPy.
+"""
+import numpy as np
+
+from timestamps import NS_PER_S
+
+METHODS = ("nearest", "linear", "hold")
+
+
+def resample(times, values, grid, method="linear", max_gap=None):
+    """
+    Values of the series (times, values) at each timestamp in 'grid'.
+
+    'times' and 'grid' are ascending int nanosecond timestamps. Grid points
+    before the first sample are NaN, and so are points after the last one
+    except with "hold". With 'max_gap' (ns), a point also becomes NaN when
+    the samples it is interpolated from are further away than that: for
+    "hold" the previous sample, for "nearest" the nearest one, and for
+    "linear" either neighbour.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown interpolation method: {method}")
+    grid = np.asarray(grid, dtype=np.int64)
+    out = np.full(len(grid), np.nan)
+    n = len(times)
+    if not n or not len(grid):
+        return out
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    # Index of the last sample at or before each grid point (-1 if none)
+    prev = np.searchsorted(times, grid, side="right") - 1
+    has_prev = prev >= 0
+    prev_c = np.maximum(prev, 0)
+    next_c = np.minimum(prev + 1, n - 1)
+    has_next = prev + 1 < n
+    # Distances to the neighbours, in ns (huge where a neighbour is missing)
+    before = np.where(has_prev, grid - times[prev_c], np.iinfo(np.int64).max)
+    after = np.where(has_next, times[next_c] - grid, np.iinfo(np.int64).max)
+    exact = has_prev & (before == 0)
+
+    if method == "hold":
+        valid = has_prev
+        result = values[prev_c]
+        gap = before
+    elif method == "nearest":
+        valid = has_prev & (has_next | exact)
+        use_next = has_next & (after < before)
+        result = np.where(use_next, values[next_c], values[prev_c])
+        gap = np.minimum(before, after)
+    else:
+        valid = (has_prev & has_next) | exact
+        span = np.where(valid & ~exact, times[next_c] - times[prev_c], 1)
+        weight = np.where(exact, 0.0, before / span)
+        result = values[prev_c] + weight * (values[next_c] - values[prev_c])
+        gap = np.where(exact, 0, np.maximum(before, after))
+    if max_gap is not None:
+        valid &= gap <= max_gap
+    out[valid] = result[valid]
+    return out
+
+
+def split_series(store, series_ids, start=0, stop=None):
+    """
+    {series ID: (times, values)} for rows [start, stop) of a SessionStore,
+    found with one stable sort of the series column rather than a scan
+    per series.
+    """
+    stop = store.size if stop is None else stop
+    ids = store.series_id[start:stop]
+    order = np.argsort(ids, kind="stable")
+    bounds = np.searchsorted(ids[order], [(s, s + 1) for s in series_ids])
+    result = {}
+    for series_id, (first, last) in zip(series_ids, bounds.tolist()):
+        rows = order[first:last] + start
+        result[series_id] = (store.timestamp[rows], store.distance[rows])
+    return result
+
+
+def make_grid(first, last, period):
+    """Grid timestamps every 'period' ns from 'first' up to and including 'last'."""
+    if last < first:
+        return np.zeros(0, dtype=np.int64)
+    return np.arange(first, last + 1, period, dtype=np.int64)
+
+
+def align_session(store, series_ids=None, period=0.1, method="linear", max_gap=None):
+    """
+    Bulk mode: the whole session of a SessionStore on one grid every
+    'period' seconds, from its first to its last sample. 'series_ids'
+    defaults to every series; 'max_gap' is in seconds.
+    """
+    if series_ids is None:
+        series_ids = list(range(len(store.registry)))
+    period_ns = int(period * NS_PER_S)
+    grid = make_grid(store.time_origin, int(store.timestamp[store.size - 1]), period_ns) \
+        if store.size else np.zeros(0, dtype=np.int64)
+    max_gap_ns = None if max_gap is None else int(max_gap * NS_PER_S)
+    samples = split_series(store, series_ids)
+    matrix = np.full((len(series_ids), len(grid)), np.nan)
+    for row, series_id in enumerate(series_ids):
+        times, values = samples[series_id]
+        matrix[row] = resample(times, values, grid, method, max_gap_ns)
+    return grid, matrix
+
+
+class SeriesAligner:
+    """
+    Incremental mode: align a set of series of a growing SessionStore.
+
+    Each update() reads only the rows appended since the previous call and
+    returns the grid columns that are now final: for "hold" up to the
+    newest sample, for "linear" and "nearest" up to the point every series
+    that is still reporting has a sample past. A series silent for more
+    than 'max_gap' seconds no longer holds the others back (and reads as
+    NaN, or its last value with "hold" when no 'max_gap' is set). Only the
+    last sample before the grid front is carried over between calls, so
+    memory stays proportional to the rows per update.
+    """
+
+    def __init__(self, store, series_ids, period=0.1, method="linear", max_gap=1.0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown interpolation method: {method}")
+        self.store = store
+        self.series_ids = list(series_ids)
+        self.period = int(period * NS_PER_S)
+        self.method = method
+        self.max_gap = None if max_gap is None else int(max_gap * NS_PER_S)
+        self.reset()
+
+    def reset(self):
+        """Start over from the first row of the store."""
+        self._row = 0
+        # First grid timestamp not yet returned
+        self._next = None
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        self._pending = {series_id: empty for series_id in self.series_ids}
+
+    def _horizon(self, newest):
+        # Latest grid time every series can already be evaluated at
+        if self.method == "hold":
+            return newest
+        horizon = newest
+        for times, _ in self._pending.values():
+            last = int(times[-1]) if len(times) else None
+            if last is None or (self.max_gap is not None and newest - last > self.max_gap):
+                continue  # not reporting; does not hold the grid back
+            horizon = min(horizon, last)
+        return horizon
+
+    def update(self):
+        """Return (grid, matrix) for the grid columns completed since the last call."""
+        store = self.store
+        if store.size < self._row:
+            self.reset()  # the store was cleared (call reset() yourself if it may have refilled)
+        start, stop = self._row, store.size
+        self._row = stop
+        if stop > start:
+            for series_id, (times, values) in split_series(store, self.series_ids, start, stop).items():
+                if len(times):
+                    old_times, old_values = self._pending[series_id]
+                    self._pending[series_id] = (np.concatenate((old_times, times)),
+                                                np.concatenate((old_values, values)))
+            if self._next is None:
+                self._next = store.time_origin
+        if self._next is None or not stop:
+            return np.zeros(0, dtype=np.int64), np.zeros((len(self.series_ids), 0))
+        grid = make_grid(self._next, self._horizon(int(store.timestamp[stop - 1])), self.period)
+        matrix = np.full((len(self.series_ids), len(grid)), np.nan)
+        if len(grid):
+            self._next = int(grid[-1]) + self.period
+            for row, series_id in enumerate(self.series_ids):
+                times, values = self._pending[series_id]
+                matrix[row] = resample(times, values, grid, self.method, self.max_gap)
+                # Keep the last sample at or before the grid front and everything after it
+                keep = max(0, int(np.searchsorted(times, grid[-1], side="right")) - 1)
+                self._pending[series_id] = (times[keep:], values[keep:])
+        return grid, matrix
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity circular buffer of numbers backed by one NumPy array.
+
+    Every value is written twice, at slot i and slot i + capacity of a
+    2 x capacity array, so the newest values always sit in one contiguous
+    stretch and view() can hand pyqtgraph an array without copying or
+    reallocating anything per sample.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self._pos = 0    # Slot the next value goes to
+        self._size = 0   # Number of valid values
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        pos = self._pos
+        self._data[pos] = value
+        self._data[pos + self.capacity] = value
+        self._pos = pos + 1 if pos + 1 < self.capacity else 0
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, values):
+        """Append a sequence of values with at most four slice copies."""
+        values = np.asarray(values, dtype=self.dtype)
+        capacity = self.capacity
+        if len(values) >= capacity:
+            # Only the newest 'capacity' values survive
+            values = values[-capacity:]
+            self._data[:capacity] = values
+            self._data[capacity:] = values
+            self._pos = 0
+            self._size = capacity
+            return
+        pos = self._pos
+        first = min(len(values), capacity - pos)
+        for start, chunk in ((pos, values[:first]), (0, values[first:])):
+            if len(chunk):
+                self._data[start:start + len(chunk)] = chunk
+                self._data[start + capacity:start + capacity + len(chunk)] = chunk
+        self._pos = (pos + len(values)) % capacity
+        self._size = min(capacity, self._size + len(values))
+
+    def view(self, count=None):
+        """The newest 'count' values (default: all), oldest first, as a read-only view."""
+        count = self._size if count is None else min(count, self._size)
+        end = self._pos + self.capacity
+        view = self._data[end - count:end]
+        view.flags.writeable = False
+        return view
+
+    def last(self):
+        return self._data[self._pos + self.capacity - 1] if self._size else None
+
+    def drop(self, count):
+        """Discard the oldest 'count' values."""
+        self._size -= min(count, self._size)
+
+    def resize(self, capacity):
+        """Change the capacity, keeping the newest values that still fit."""
+        capacity = max(1, int(capacity))
+        if capacity == self.capacity:
+            return
+        kept = self.view(capacity).copy()
+        self._allocate(capacity)
+        self.extend(kept)
+
+    def clear(self):
+        self._pos = 0
+        self._size = 0
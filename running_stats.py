@@ -0,0 +1,134 @@
+import collections
+import math
+
+import numpy as np
+
+from quantile_sketch import QuantileSketch
+from timestamps import NS_PER_S
+
+# Quantiles reported by summary(): median and the tails
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+class RunningStats:
+    """
+    Count, mean, variance, min/max and time span of a stream, updated in
+    constant time per sample (Welford). A batch is folded in at once by
+    merging its own mean and squared deviations (Chan et al.), so a batch
+    costs a few NumPy reductions over the new values only.
+
+    Distances have heavy-tailed outliers, so a QuantileSketch (constant
+    memory) also tracks the median and tail percentiles.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        # Sum of squared deviations from the mean
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.first_time = None
+        self.last_time = None
+        self.quantiles = QuantileSketch()
+
+    def add_many(self, values, times):
+        """Fold in a batch of values and their (ascending) int nanosecond timestamps."""
+        n = len(values)
+        if not n:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.quantiles.add_many(values)
+        if self.first_time is None:
+            self.first_time = int(times[0])
+        self.last_time = int(times[-1])
+
+    def std(self):
+        """Sample standard deviation (0 below two samples)."""
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1)) if self.count > 1 else 0.0
+
+    def rate(self):
+        """Samples per second over the time span covered, or 0."""
+        span = (self.last_time - self.first_time) / NS_PER_S if self.count > 1 else 0.0
+        return (self.count - 1) / span if span > 0 else 0.0
+
+    def summary(self):
+        """Dict of count, mean, std, min, max, rate, p50, p95 and p99."""
+        empty = not self.count
+        # The exact min/max bound the sketch's estimates
+        p50, p95, p99 = (min(max(q, self.min), self.max) if not empty else math.nan
+                         for q in self.quantiles.quantiles(SUMMARY_QUANTILES).tolist())
+        return {
+            "count": self.count,
+            "mean": self.mean if not empty else math.nan,
+            "std": self.std(),
+            "min": self.min if not empty else math.nan,
+            "max": self.max if not empty else math.nan,
+            "rate": self.rate(),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        }
+
+
+class WindowStats(RunningStats):
+    """
+    RunningStats over a sliding window of samples.
+
+    Samples leaving the window are subtracted again (inverse Welford merge,
+    and out of the quantile sketch's bins), and min/max come from monotonic queues of (row, value), so every sample
+    enters and leaves each queue once. Rows are the store row numbers and
+    must increase.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._mins = collections.deque()
+        self._maxs = collections.deque()
+
+    def add_rows(self, rows, values, times):
+        self.add_many(values, times)
+        mins, maxs = self._mins, self._maxs
+        for row, value in zip(rows.tolist(), np.asarray(values, dtype=np.float64).tolist()):
+            while mins and mins[-1][1] >= value:
+                mins.pop()
+            mins.append((row, value))
+            while maxs and maxs[-1][1] <= value:
+                maxs.pop()
+            maxs.append((row, value))
+        self.min, self.max = mins[0][1], maxs[0][1]
+
+    def remove_rows(self, values, first_row, first_time):
+        """
+        Subtract the samples that left the window; 'first_row' and
+        'first_time' belong to the oldest sample still in it.
+        """
+        n = len(values)
+        if not n:
+            return
+        remaining = self.count - n
+        if remaining <= 0:
+            self.__init__()
+            return
+        values = np.asarray(values, dtype=np.float64)
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        mean = (self.mean * self.count - batch_mean * n) / remaining
+        delta = batch_mean - mean
+        self.m2 -= batch_m2 + delta * delta * remaining * n / self.count
+        self.quantiles.remove_many(values)
+        self.mean = mean
+        self.count = remaining
+        self.first_time = int(first_time)
+        for queue in (self._mins, self._maxs):
+            while queue and queue[0][0] < first_row:
+                queue.popleft()
+        self.min, self.max = self._mins[0][1], self._maxs[0][1]
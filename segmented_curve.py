@@ -0,0 +1,178 @@
+import collections
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore, QtGui
+
+# Points per frozen history segment
+SEGMENT_POINTS = 512
+
+# A frozen stretch of the curve: x of its first and last point, its path
+# and the path's bounding rectangle (both computed once)
+Segment = collections.namedtuple("Segment", "first_x last_x path bounds")
+
+
+class SegmentedCurveItem(pg.GraphicsObject):
+    """
+    A line curve that only rebuilds the part of its path that changed.
+
+    PlotCurveItem turns the whole window into a new QPainterPath on every
+    setData, although only the newest points are new. This item keeps the
+    history as immutable QPainterPath segments of SEGMENT_POINTS points and
+    rebuilds only the live tail: setData(x, y) with the window of a series
+    finds the points past the last one it has seen (x ascending, as
+    SessionStore.series_window returns it), appends them to the tail and
+    freezes the tail into a segment once it is full. Segments that slid out
+    of the window are dropped, and the part of the oldest one before the
+    window start is clipped when painting. An update therefore costs in
+    proportion to the new points, not the window. A window that moves
+    backwards (resized, refilled, new session) is rebuilt once.
+
+    It offers the part of PlotDataItem's interface the plotter uses
+    (setData with style keywords, opts, name(), xData/yData, getData()),
+    so it can stand in for a plotted curve and appear in the legend, and
+    accepts every plot-wide setting PlotItem applies to its data items. It
+    draws lines only: no symbols, downsampling, clip-to-view or data
+    transforms (log, FFT, derivative, phase map); those settings are
+    ignored.
+    """
+
+    def __init__(self, pen=None, name=None, segment_points=SEGMENT_POINTS, **_style):
+        super().__init__()
+        self.segment_points = segment_points
+        self.opts = {'pen': pg.mkPen(pen), 'name': name, 'symbol': None, 'antialias': False,
+                     'fillLevel': None, 'fillBrush': None}
+        self.xData = None
+        self.yData = None
+        self._reset()
+
+    def implements(self, interface=None):
+        # Lets PlotItem list the curve in the legend like a PlotDataItem
+        interfaces = ['plotData']
+        if interface is None:
+            return interfaces
+        return interface in interfaces
+
+    def name(self):
+        return self.opts['name']
+
+    def getData(self):
+        return self.xData, self.yData
+
+    # PlotItem applies its plot-wide settings (context menu, setLogMode(),
+    # ...) to every data item; lines drawn from cached segments ignore them
+    def setDownsampling(self, *args, **kwargs):
+        pass
+
+    def setClipToView(self, *args, **kwargs):
+        pass
+
+    def setAlpha(self, *args, **kwargs):
+        pass
+
+    def setPointMode(self, *args, **kwargs):
+        pass
+
+    def setLogMode(self, *args, **kwargs):
+        pass
+
+    def setFftMode(self, *args, **kwargs):
+        pass
+
+    def setDerivativeMode(self, *args, **kwargs):
+        pass
+
+    def setPhasemapMode(self, *args, **kwargs):
+        pass
+
+    def _reset(self):
+        self._segments = collections.deque()
+        # Points not yet frozen; the first is the last point of the newest segment
+        self._tail_x = np.zeros(0)
+        self._tail_y = np.zeros(0)
+        self._tail_path = QtGui.QPainterPath()
+        self._window_start = None
+        self._bounds = None
+
+    def setData(self, x=None, y=None, **style):
+        if 'pen' in style:
+            self.opts['pen'] = pg.mkPen(style['pen'])
+        if 'name' in style:
+            self.opts['name'] = style['name']
+        x = np.asarray(x if x is not None else [], dtype=np.float64)
+        y = np.asarray(y if y is not None else [], dtype=np.float64)
+        self.xData, self.yData = x, y
+        last_x = self._tail_x[-1] if len(self._tail_x) else None
+        if (not len(x) or last_x is None or x[0] < self._window_start or x[0] > last_x):
+            # Nothing shared with what is drawn: start over
+            self._reset()
+            new = 0
+        else:
+            new = int(np.searchsorted(x, last_x, side='right'))
+        self.prepareGeometryChange()
+        if len(x):
+            self._window_start = x[0]
+            while self._segments and self._segments[0].last_x < x[0]:
+                self._segments.popleft()
+            self._extend(x[new:], y[new:])
+        self._update_bounds()
+        self.update()
+
+    def _extend(self, x, y):
+        if not len(x):
+            return
+        tail_x = np.concatenate((self._tail_x, x))
+        tail_y = np.concatenate((self._tail_y, y))
+        size = self.segment_points
+        while len(tail_x) > size:
+            # Freeze the oldest 'size' + 1 points; the last one also starts the new tail
+            path = pg.arrayToQPath(tail_x[:size + 1], tail_y[:size + 1])
+            self._segments.append(Segment(tail_x[0], tail_x[size], path, path.boundingRect()))
+            tail_x, tail_y = tail_x[size:], tail_y[size:]
+        self._tail_x, self._tail_y = tail_x, tail_y
+        self._tail_path = pg.arrayToQPath(tail_x, tail_y)
+
+    def _update_bounds(self):
+        rects = [segment.bounds for segment in self._segments]
+        if len(self._tail_x):
+            rects.append(self._tail_path.boundingRect())
+        if not rects:
+            self._bounds = None
+            return
+        bounds = QtCore.QRectF(rects[0])
+        for rect in rects[1:]:
+            bounds = bounds.united(rect)
+        # Whatever lies before the window start is clipped away
+        bounds.setLeft(max(bounds.left(), self._window_start))
+        self._bounds = bounds
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        if self._bounds is None:
+            return (None, None)
+        if ax == 0:
+            return (self._bounds.left(), self._bounds.right())
+        return (self._bounds.top(), self._bounds.bottom())
+
+    def viewTransformChanged(self):
+        # The pen padding in boundingRect() depends on the pixel size
+        self.prepareGeometryChange()
+
+    def boundingRect(self):
+        if self._bounds is None:
+            return QtCore.QRectF()
+        # Room for the (cosmetic) pen width around the data
+        px, py = self.pixelVectors()
+        width = max(self.opts['pen'].widthF(), 1.0)
+        px = 0.0 if px is None else px.length() * width
+        py = 0.0 if py is None else py.length() * width
+        return self._bounds.adjusted(-px, -py, px, py)
+
+    def paint(self, painter, *args):
+        if self._bounds is None:
+            return
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, self.opts['antialias'])
+        painter.setPen(self.opts['pen'])
+        painter.setClipRect(self.boundingRect())
+        for segment in self._segments:
+            painter.drawPath(segment.path)
+        painter.drawPath(self._tail_path)
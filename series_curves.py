@@ -0,0 +1,108 @@
+from timestamps import NS_PER_S
+
+
+class SeriesCurves:
+    """
+    The plot curves of the live series, at most 'max_live' of them.
+
+    A series is live while it has a curve. When a new series needs one and
+    the cap is reached, the least recently active series gives up its
+    curve only if it has been silent for 'grace' seconds; otherwise the new
+    series stays unplotted until a slot frees up, so a crowd of busy series
+    does not swap curves in and out on every frame. Series silent for more
+    than 'idle_timeout' seconds are dropped by expire(). Their samples stay
+    in the session store, and a curve comes back with their next samples.
+
+    Released curves are removed from the plot (and so from the legend) and
+    pooled; the next series to go live restyles a pooled curve instead of
+    constructing a new one. 'style' maps a series key to the keyword
+    arguments of PlotDataItem (pen, symbol, name, ...). 'factory', if
+    given, builds an item from those keywords instead of plot.plot() (e.g.
+    a SegmentedCurveItem), and is added to the plot here.
+    """
+
+    def __init__(self, plot, style, max_live=64, idle_timeout=60.0, factory=None, grace=5.0):
+        self.plot = plot
+        self.style = style
+        self.factory = factory
+        self.max_live = max_live
+        self.idle_timeout = idle_timeout
+        self.grace = grace
+        # Series ID -> curve, and its last sample time (ns)
+        self.live = {}
+        self._activity = {}
+        self._pool = []
+
+    def __contains__(self, series_id):
+        return series_id in self.live
+
+    def __len__(self):
+        return len(self.live)
+
+    def is_idle(self, last_time, now):
+        """Whether a series last sampled at 'last_time' is idle at 'now' (both ns)."""
+        return now - last_time > self.idle_timeout * NS_PER_S
+
+    def acquire(self, series_id, key, last_time, now):
+        """
+        The curve of a series, making it live if a slot is free or can be
+        freed; None if every plotted series is still active. 'last_time' is
+        the series' newest sample and 'now' the newest of the session (ns).
+        """
+        curve = self.live.get(series_id)
+        if curve is not None:
+            self._activity[series_id] = last_time
+            return curve
+        if len(self.live) >= self.max_live:
+            oldest = min(self.live, key=self._activity.__getitem__) if self.live else None
+            if oldest is None or now - self._activity[oldest] <= self.grace * NS_PER_S:
+                return None
+            self.release(oldest)
+        self._activity[series_id] = last_time
+        style = self.style(key)
+        if self._pool:
+            curve = self._pool.pop()
+            curve.setData([], [], **style)
+            # Re-adding it lists it in the legend under its new name
+            self.plot.addItem(curve)
+        elif self.factory is None:
+            curve = self.plot.plot(**style)
+        else:
+            curve = self.factory(**style)
+            self.plot.addItem(curve)
+        self.live[series_id] = curve
+        return curve
+
+    def release(self, series_id):
+        """Take a series off the plot and keep its curve for reuse."""
+        curve = self.live.pop(series_id, None)
+        self._activity.pop(series_id, None)
+        if curve is None:
+            return
+        self.plot.removeItem(curve)
+        curve.setData([], [])
+        self._pool.append(curve)
+
+    def expire(self, now):
+        """Release every series idle at 'now' (ns); return their IDs."""
+        idle = [series_id for series_id, last_time in self._activity.items() if self.is_idle(last_time, now)]
+        for series_id in idle:
+            self.release(series_id)
+        return idle
+
+    def set_max_live(self, max_live):
+        """Change the cap, releasing the least recently active series above it."""
+        self.max_live = max_live
+        while len(self.live) > max_live:
+            self.release(min(self.live, key=self._activity.__getitem__))
+
+    def set_factory(self, factory):
+        """Build curves with 'factory' (None: plot.plot()) from now on, replacing the current ones."""
+        self.factory = factory
+        self.clear()
+        self._pool = []
+
+    def clear(self):
+        """Release every series (e.g. for a new session)."""
+        for series_id in list(self.live):
+            self.release(series_id)
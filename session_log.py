@@ -0,0 +1,68 @@
+"""
+The session log format written by the Log button and the headless capture:
+
+    Timestamp,Anchor_Type,Distance
+    2024-05-01 12:00:00.123,Anchor 1 Device 2 RAW,3.45
+"""
+import datetime
+import re
+
+from line_parser import DistanceSample
+from timestamps import NS_PER_S
+
+LOG_HEADER = "Timestamp,Anchor_Type,Distance\n"
+LOG_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+LOG_LINE_RE = re.compile(r"^([^,]+),Anchor\s+(\d+)(?:\s+Device\s+(\d+))?\s+(\S+),\s*([^,\s]+)$")
+
+
+def _format_timestamp(timestamp):
+    # Whole seconds and microseconds separately, so no float rounding creeps in
+    seconds, ns = divmod(timestamp, NS_PER_S)
+    stamp = datetime.datetime.fromtimestamp(seconds).replace(microsecond=ns // 1000)
+    return stamp.strftime(LOG_TIMESTAMP_FORMAT)[:-3]
+
+
+def _parse_timestamp(text):
+    # The inverse of _format_timestamp, in integers: the whole seconds come
+    # out of timestamp() exactly, and the microseconds are added as ns
+    stamp = datetime.datetime.strptime(text, LOG_TIMESTAMP_FORMAT)
+    seconds = int(stamp.replace(microsecond=0).timestamp())
+    return seconds * NS_PER_S + stamp.microsecond * 1000
+
+
+def format_log_line(sample):
+    """One log line for a DistanceSample, stamped with its arrival time."""
+    return (f"{_format_timestamp(sample.timestamp)},"
+            f"Anchor {sample.anchor_id} Device {sample.device_id} {sample.type_str},{sample.distance}\n")
+
+
+def format_store_rows(store, start, stop):
+    """Log text for rows [start, stop) of a SessionStore."""
+    labels = [f"Anchor {a} Device {d} {t}" for a, d, t in store.registry.keys]
+    # astype(str) gives the shortest text that round-trips the float32 distance
+    return "".join(
+        f"{_format_timestamp(timestamp)},{labels[series_id]},{distance}\n"
+        for series_id, timestamp, distance in zip(
+            store.series_id[start:stop].tolist(),
+            store.timestamp[start:stop].tolist(),
+            store.distance[start:stop].astype(str)))
+
+
+def load_log(path):
+    """Return the DistanceSamples of a session log, ordered by time."""
+    samples = []
+    with open(path, 'r', errors='ignore') as log_file:
+        for line in log_file:
+            match = LOG_LINE_RE.match(line.strip())
+            if not match:
+                continue  # header (written on every append) or junk
+            try:
+                timestamp = _parse_timestamp(match.group(1))
+                distance = float(match.group(5))
+            except ValueError:
+                continue
+            device_id = int(match.group(3)) if match.group(3) else 1
+            samples.append(DistanceSample(int(match.group(2)), device_id, match.group(4), distance, timestamp))
+    # Logs opened in append mode may hold several sessions
+    samples.sort(key=lambda s: s.timestamp)
+    return samples
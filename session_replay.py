@@ -0,0 +1,135 @@
+"""
+Replay saved sessions through the live plotting path.
+
+Records come from session_log.load_log() (the CSV written by the Log
+button) or load_capture() (a raw byte capture, framed and parsed here).
+SessionReplayer hands them back out in batches at 1x, Nx or unthrottled
+speed, with pause and seek.
+"""
+import bisect
+import os
+import threading
+
+from line_framer import LineFramer
+from line_parser import LineParser
+from timestamps import NS_PER_S
+
+# Bytes per read when slicing a raw capture into timed batches
+CAPTURE_CHUNK = 256
+
+
+def load_capture(path, baud=115200):
+    """
+    Frame and parse a raw UART capture. A capture has no timestamps, so each
+    record is timed by its byte offset at 'baud' (10 bits per byte), ending
+    at the file's modification time.
+    """
+    byte_ns = 10 * NS_PER_S // baud
+    start = os.stat(path).st_mtime_ns - os.path.getsize(path) * byte_ns
+    framer = LineFramer()
+    parser = LineParser()
+    records = []
+    offset = 0
+    with open(path, 'rb') as capture:
+        while True:
+            chunk = capture.read(CAPTURE_CHUNK)
+            if not chunk:
+                break
+            offset += len(chunk)
+            records.extend(parser.parse_lines(framer.feed(chunk), start + offset * byte_ns))
+    return records
+
+
+class SessionReplayer:
+    """
+    Play back time-ordered records against a wall clock.
+
+    'speed' is a playback factor (1.0 = real time), or None to hand out
+    records as fast as they are asked for. All methods take the current
+    monotonic time so the replayer itself never reads a clock, and are
+    safe to call from another thread than next_batch().
+
+    'generation' is a tag the owner sets with each seek(); next_batch()
+    hands it out with every batch, taken under the same lock, so batches
+    selected before a seek can be told apart from those after it.
+    """
+
+    def __init__(self, records, speed=1.0):
+        self.records = records
+        # Session times in seconds (records carry int nanoseconds)
+        self.times = [record.timestamp / NS_PER_S for record in records]
+        self.start_time = self.times[0] if records else 0.0
+        self.duration = self.times[-1] - self.start_time if records else 0.0
+        self.speed = speed
+        self.paused = False
+        self.position = 0  # Index of the next record to hand out
+        self.generation = 0
+        self._lock = threading.Lock()
+        # Session time '_anchor_session' corresponds to wall time '_anchor_wall'
+        self._anchor_session = self.start_time
+        self._anchor_wall = None
+
+    @property
+    def finished(self):
+        return self.position >= len(self.records)
+
+    def _session_time(self, now):
+        if self.paused or self._anchor_wall is None or self.speed is None:
+            return self._anchor_session
+        return self._anchor_session + (now - self._anchor_wall) * self.speed
+
+    def _rebase(self, session_time, now):
+        self._anchor_session = session_time
+        self._anchor_wall = now
+
+    def elapsed(self, now):
+        """Seconds into the session that playback has reached."""
+        with self._lock:
+            return min(self._session_time(now), self.start_time + self.duration) - self.start_time
+
+    def set_speed(self, speed, now):
+        with self._lock:
+            self._rebase(self._session_time(now), now)
+            self.speed = speed
+
+    def pause(self, now):
+        with self._lock:
+            self._rebase(self._session_time(now), now)
+            self.paused = True
+
+    def resume(self, now):
+        with self._lock:
+            self.paused = False
+            self._rebase(self._anchor_session, now)
+
+    def seek(self, offset, now, generation=None):
+        """Jump to 'offset' seconds from the start of the session, tagging later batches with 'generation'."""
+        with self._lock:
+            if generation is not None:
+                self.generation = generation
+            session_time = self.start_time + max(0.0, min(offset, self.duration))
+            self.position = bisect.bisect_left(self.times, session_time)
+            self._rebase(session_time, now)
+
+    def next_batch(self, now, max_records=5000):
+        """Return (generation, records) for the records that are due at wall time 'now'."""
+        with self._lock:
+            return self.generation, self._next_records(now, max_records)
+
+    def _next_records(self, now, max_records):
+        if self.paused or self.finished:
+            return []
+        if self._anchor_wall is None:
+            self._rebase(self._anchor_session, now)
+        if self.speed is None:
+            end = min(self.position + max_records, len(self.records))
+        else:
+            end = bisect.bisect_right(self.times, self._session_time(now), self.position)
+            end = min(end, self.position + max_records)
+        batch = self.records[self.position:end]
+        self.position = end
+        if batch and self.speed is None:
+            # Keep the clock on the last record handed out, so switching
+            # back to timed playback continues from here
+            self._rebase(self.times[end - 1], now)
+        return batch
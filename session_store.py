@@ -0,0 +1,392 @@
+import json
+import os
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+from running_stats import RunningStats, WindowStats
+from timestamps import NS_PER_S
+
+
+class SeriesRegistry:
+    """
+    Map each (anchor_id, device_id, type_str) key to a small integer ID,
+    handed out in order of first appearance, so the store keeps one int32
+    per sample instead of a tuple.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        # Key of each series ID
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def intern(self, key):
+        """Return the ID of 'key', registering it if it is new."""
+        series_id = self._ids.get(key)
+        if series_id is None:
+            series_id = self._ids[key] = len(self.keys)
+            self.keys.append(key)
+        return series_id
+
+    def lookup(self, key):
+        """Return the ID of 'key', or None if it was never seen."""
+        return self._ids.get(key)
+
+    def clear(self):
+        self._ids.clear()
+        self.keys = []
+
+
+# Column name and type; float32 is plenty for distances and halves the column.
+# Timestamps are int64 nanoseconds (see timestamps.py).
+COLUMNS = (("series_id", np.int32), ("timestamp", np.int64), ("distance", np.float32))
+# Rows scanned per step when looking back through the history
+HISTORY_CHUNK = 65536
+
+
+class SessionStore:
+    """
+    Every distance sample of a session, once, in append-only typed columns.
+
+    Row i is (series_id[i], timestamp[i], distance[i]); the columns grow by
+    doubling, so appending a batch is a few slice copies. Each series also
+    keeps a RingBuffer of the row numbers in its visible window, so the plot
+    gathers its points straight from the columns, the log formats rows from
+    them, and counts and statistics read them - nothing holds a second copy.
+    Running statistics per series, over the session and over the visible
+    window, are updated as rows arrive and leave the window.
+
+    The window holds either the newest 'window_size' rows of each series,
+    or, after set_window_seconds(), the rows of the last N seconds before
+    the newest sample of the session, so fast and slow series cover the
+    same span. A second ring keeps each window's timestamps (ascending),
+    so expiry is a binary search per series and a drop of the oldest
+    entries, not a scan; the rings grow by doubling when the horizon
+    holds more rows than they fit.
+
+    With a 'directory' the columns are memory-mapped files there
+    (series_id.i32, timestamp.i64, distance.f32 plus session.json), so the
+    whole session history is kept while resident memory stays flat: the OS
+    pages old rows out and only the visible windows are touched. The
+    directory is created when the first rows arrive. If it cannot be
+    created or grown (read-only folder, disk full), the store keeps going
+    in memory and records the reason in 'disk_error'.
+    """
+
+    def __init__(self, window_size=100, capacity=65536, directory=None):
+        self.registry = SeriesRegistry()
+        # Rows per series kept in the visible window
+        self.window_size = window_size
+        # Seconds per series kept in the window instead, or None
+        self.window_seconds = None
+        self.directory = directory
+        # Why a store given a directory fell back to memory, or None
+        self.disk_error = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._mapped = False
+        if self.directory is None:
+            for name, dtype in COLUMNS:
+                setattr(self, name, np.zeros(capacity, dtype=dtype))
+        else:
+            # Placeholders until the files are created on the first append
+            for name, dtype in COLUMNS:
+                setattr(self, name, np.zeros(0, dtype=dtype))
+        self.size = 0
+        # Largest timestamp so far; the time window ends here
+        self.newest_time = 0
+        # Per series ID: total samples, row numbers of the visible window,
+        # and the timestamps of those rows
+        self.series_counts = []
+        self._windows = []
+        self._window_times = []
+        # Per series ID: RunningStats over the session and WindowStats over the window
+        self.session_stats = []
+        self.window_stats = []
+
+    def _column_path(self, name):
+        suffix = {"series_id": "i32", "timestamp": "i64", "distance": "f32"}[name]
+        return os.path.join(self.directory, f"{name}.{suffix}")
+
+    def _map(self, capacity):
+        # (Re)map every column file at 'capacity' rows, growing the files
+        # sparsely; rows already written stay where they are
+        os.makedirs(self.directory, exist_ok=True)
+        for name, dtype in COLUMNS:
+            column = getattr(self, name)
+            if isinstance(column, np.memmap):
+                column.flush()
+            # Unmap before resizing (Windows refuses to resize a mapped file)
+            setattr(self, name, None)
+            del column
+            path = self._column_path(name)
+            with open(path, "ab") as column_file:
+                column_file.truncate(capacity * np.dtype(dtype).itemsize)
+            setattr(self, name, np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,)))
+        self.capacity = capacity
+        self._mapped = True
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, count):
+        needed = self.size + count
+        capacity = self.capacity
+        if needed <= capacity and (self._mapped or self.directory is None):
+            return
+        while capacity < needed:
+            capacity *= 2
+        if self.directory is not None:
+            try:
+                self._map(capacity)
+                return
+            except OSError as e:
+                self._fall_back_to_memory(e)
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    def append(self, samples):
+        """
+        Append a sequence of DistanceSamples. Return the IDs of the series
+        whose windows changed (new rows, or rows expired from a time
+        window), in ascending order.
+        """
+        count = len(samples)
+        if not count:
+            return []
+        self._reserve(count)
+        intern = self.registry.intern
+        start, stop = self.size, self.size + count
+        ids = self.series_id[start:stop]
+        ids[:] = [intern((s.anchor_id, s.device_id, s.type_str)) for s in samples]
+        self.timestamp[start:stop] = [s.timestamp for s in samples]
+        self.distance[start:stop] = [s.distance for s in samples]
+        self.size = stop
+        self.newest_time = max(self.newest_time, int(self.timestamp[start:stop].max()))
+        if len(self._windows) < len(self.registry):
+            while len(self._windows) < len(self.registry):
+                self._windows.append(RingBuffer(self.window_size, np.int64))
+                self._window_times.append(RingBuffer(self.window_size, np.int64))
+                self.series_counts.append(0)
+                self.session_stats.append(RunningStats())
+                self.window_stats.append(WindowStats())
+            if self.directory is not None:
+                self.save_meta()
+        touched = np.unique(ids).tolist()
+        if len(touched) == 1:
+            self._extend_series(touched[0], np.arange(start, stop))
+        else:
+            for series_id in touched:
+                self._extend_series(series_id, np.flatnonzero(ids == series_id) + start)
+        if self.window_seconds is not None:
+            expired = self._expire(self.newest_time - int(self.window_seconds * NS_PER_S))
+            if expired:
+                touched = sorted(set(touched).union(expired))
+        return touched
+
+    def _extend_series(self, series_id, rows):
+        window = self._windows[series_id]
+        time_ring = self._window_times[series_id]
+        if self.window_seconds is not None and len(window) + len(rows) > window.capacity:
+            # A time window keeps whatever its horizon holds
+            capacity = window.capacity
+            while capacity < len(window) + len(rows):
+                capacity *= 2
+            window.resize(capacity)
+            time_ring.resize(capacity)
+        # Rows pushed out of the window by the new ones, oldest first
+        overflow = len(window) + len(rows) - window.capacity
+        if overflow > 0:
+            evicted = window.view()[:overflow]
+            evicted = np.concatenate((evicted, rows[:overflow - len(evicted)]))
+        window.extend(rows)
+        values, times = self.distance[rows], self.timestamp[rows]
+        time_ring.extend(times)
+        self.series_counts[series_id] += len(rows)
+        self.session_stats[series_id].add_many(values, times)
+        stats = self.window_stats[series_id]
+        stats.add_rows(rows, values, times)
+        if overflow > 0:
+            first = int(window.view()[0])
+            stats.remove_rows(self.distance[evicted], first, self.timestamp[first])
+
+    def _expire(self, cutoff):
+        # Drop the window rows older than 'cutoff'; return the series IDs affected
+        expired = []
+        for series_id, time_ring in enumerate(self._window_times):
+            times = time_ring.view()
+            if not len(times) or times[0] >= cutoff:
+                continue
+            count = int(np.searchsorted(times, cutoff))
+            window = self._windows[series_id]
+            evicted = self.distance[window.view()[:count]]
+            window.drop(count)
+            time_ring.drop(count)
+            if len(window):
+                first = int(window.view()[0])
+                self.window_stats[series_id].remove_rows(evicted, first, self.timestamp[first])
+            else:
+                self.window_stats[series_id] = WindowStats()
+            expired.append(series_id)
+        return expired
+
+    def _fill_window(self, series_id, rows, capacity):
+        # Replace a series window by 'rows' and recompute its statistics
+        window = RingBuffer(capacity, np.int64)
+        window.extend(rows)
+        time_ring = RingBuffer(capacity, np.int64)
+        time_ring.extend(self.timestamp[rows])
+        self._windows[series_id] = window
+        self._window_times[series_id] = time_ring
+        self.window_stats[series_id] = self._window_stats(series_id)
+
+    def _window_stats(self, series_id):
+        # Statistics of a window recomputed from its rows (after a resize)
+        stats = WindowStats()
+        rows = self._windows[series_id].view()
+        if len(rows):
+            stats.add_rows(rows, self.distance[rows], self.timestamp[rows])
+        return stats
+
+    @property
+    def time_origin(self):
+        """Timestamp of the first row, where the plot's time axis starts."""
+        return int(self.timestamp[0]) if self.size else 0
+
+    def series_window(self, series_id):
+        """
+        (x, y) arrays for the visible window of a series: the arrival time
+        in seconds since the first row of the session, and the distance.
+        Series with different rates therefore share one time axis.
+        """
+        rows = self._windows[series_id].view()
+        x = (self.timestamp[rows] - self.time_origin) / NS_PER_S
+        return x, self.distance[rows]
+
+    def series_rows(self, series_id, start=0, stop=None):
+        """Row numbers of one series within rows [start, stop)."""
+        stop = self.size if stop is None else stop
+        return np.flatnonzero(self.series_id[start:stop] == series_id) + start
+
+    def last_rows(self, series_id, count):
+        """Row numbers of the newest 'count' samples of a series, oldest first."""
+        found = []
+        needed = count
+        stop = self.size
+        while needed > 0 and stop > 0:
+            # Walk back through the history a chunk at a time
+            start = max(0, stop - HISTORY_CHUNK)
+            rows = self.series_rows(series_id, start, stop)[-needed:]
+            found.append(rows)
+            needed -= len(rows)
+            stop = start
+        return np.concatenate(found[::-1]) if found else np.zeros(0, dtype=np.int64)
+
+    def rows_since(self, cutoff):
+        """
+        Row numbers of the samples stamped at or after 'cutoff', as one
+        array per series ID, found in a single pass over the history.
+        """
+        start = self.size
+        while start > 0:
+            start = max(0, start - HISTORY_CHUNK)
+            # Rows are appended in arrival order, so older chunks are older still
+            if self.timestamp[start] < cutoff:
+                break
+        rows = np.flatnonzero(self.timestamp[start:self.size] >= cutoff) + start
+        series_ids = self.series_id[rows]
+        # Group by series, each group staying in row order
+        rows = rows[np.argsort(series_ids, kind='stable')]
+        ends = np.cumsum(np.bincount(series_ids, minlength=len(self._windows)))
+        return np.split(rows, ends[:-1])
+
+    def set_window_size(self, window_size, refill=True):
+        """
+        Resize every series window in place. Growing a window refills it
+        from the history, so nothing the slider hid is lost. While a time
+        window is set this only records the size for later.
+        """
+        grown = window_size > self.window_size
+        self.window_size = window_size
+        if self.window_seconds is not None:
+            return
+        for series_id, window in enumerate(self._windows):
+            if (refill and grown and len(window) < min(window_size, self.series_counts[series_id])):
+                self._fill_window(series_id, self.last_rows(series_id, window_size), window_size)
+            else:
+                window.resize(window_size)
+                self._window_times[series_id].resize(window_size)
+                self.window_stats[series_id] = self._window_stats(series_id)
+
+    def set_window_seconds(self, seconds):
+        """
+        Keep the last 'seconds' of every series in its window, or with None
+        the newest window_size rows again. The windows are refilled from
+        the history either way.
+        """
+        self.window_seconds = seconds
+        if seconds is not None:
+            since = self.rows_since(self.newest_time - int(seconds * NS_PER_S))
+        for series_id in range(len(self._windows)):
+            if seconds is None:
+                rows = self.last_rows(series_id, self.window_size)
+                capacity = self.window_size
+            else:
+                rows = since[series_id]
+                capacity = max(self.window_size, len(rows))
+            self._fill_window(series_id, rows, capacity)
+
+    def _fall_back_to_memory(self, error):
+        # Keep the rows written so far as in-memory columns
+        self.disk_error = str(error)
+        for name, dtype in COLUMNS:
+            column = getattr(self, name)
+            if column is None or len(column) < self.size:
+                # Unmapped half-way through a remap; read the rows back
+                try:
+                    column = np.fromfile(self._column_path(name), dtype=dtype, count=self.size)
+                except (OSError, ValueError):
+                    column = np.zeros(0, dtype=dtype)
+            kept = np.zeros(self.capacity, dtype=dtype)
+            rows = min(self.size, len(column))
+            kept[:rows] = column[:rows]
+            setattr(self, name, kept)
+        self.directory = None
+        self._mapped = False
+
+    def save_meta(self):
+        """Record the row count and series keys next to the column files."""
+        if self.directory is None or not self._mapped:
+            return
+        try:
+            for name, _ in COLUMNS:
+                getattr(self, name).flush()
+            with open(os.path.join(self.directory, "session.json"), "w") as meta_file:
+                json.dump({"size": self.size, "series": self.registry.keys}, meta_file)
+        except OSError as e:
+            # Called from a timer; the rows stay mapped, so just report it
+            self.disk_error = str(e)
+
+    def close(self):
+        self.save_meta()
+
+    def clear(self):
+        """Drop every row; a disk-backed store reuses (overwrites) its files."""
+        self.registry.clear()
+        self.size = 0
+        self.newest_time = 0
+        self.series_counts = []
+        self._windows = []
+        self._window_times = []
+        self.session_stats = []
+        self.window_stats = []
+        self.save_meta()
@@ -0,0 +1,24 @@
+"""
+Sample timestamps: int64 nanoseconds since the Unix epoch.
+
+The reader stamps each chunk with time.monotonic_ns() as its bytes arrive
+and shifts it onto the wall clock with one offset taken at start-up, so
+intervals between samples are exact and never jump with NTP or DST, while
+the log can still print calendar times.
+"""
+import time
+
+NS_PER_S = 1_000_000_000
+
+# Wall-clock time minus monotonic time, measured once for the whole process
+WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def to_wall_ns(monotonic_ns):
+    """Map a time.monotonic_ns() reading onto the wall clock."""
+    return monotonic_ns + WALL_OFFSET_NS
+
+
+def from_seconds(seconds):
+    """Timestamp for a time.time()-style float."""
+    return int(round(seconds * NS_PER_S))
@@ -0,0 +1,337 @@
+"""
+Byte transports that all look like a pyserial port to the reader.
+
+Every transport exposes is_open, in_waiting, read(size), readinto(buffer),
+wait_readable(timeout), write(data) and close(), so SerialReaderThread and the framing/parsing pipeline do not care
+where the bytes come from. Use open_transport() to pick one from a port
+string:
+
+    COM3, /dev/ttyUSB0, loop://  serial port (anything pyserial accepts)
+    tcp://host:port              TCP client, e.g. a UART-to-TCP bridge
+    tcp-server://host:port       TCP server, reads from the first client
+    pipe:///path/to/fifo         existing POSIX FIFO or pty device
+    pty://                       new POSIX pty; write to .slave_name
+    file:///path/to/capture.bin  raw byte capture, read to the end
+"""
+import os
+import select
+import socket
+import time
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+import serial
+
+# Upper bound reported by in_waiting for transports that cannot count
+# pending bytes; read() returns whatever is actually available
+CHUNK_SIZE = 65536
+# Polling interval (s) of wait_readable() for ports that cannot be selected on
+POLL_INTERVAL = 0.001
+
+
+class SerialTransport:
+    """A pyserial port (COM port, tty, or a pyserial URL such as loop://)."""
+
+    # Driver receive queue (Windows default input buffer, Linux N_TTY buffer);
+    # finding it this full means received bytes may have been dropped
+    rx_buffer_size = 4096
+
+    def __init__(self, port, baud, timeout=0.1):
+        self.port = serial.serial_for_url(port, baud, timeout=timeout)
+
+    @property
+    def is_open(self):
+        return self.port.is_open
+
+    @property
+    def in_waiting(self):
+        return self.port.in_waiting
+
+    def read(self, size=1):
+        return self.port.read(size)
+
+    def wait_readable(self, timeout):
+        """Wait at most 'timeout' seconds for received bytes; return whether any are queued."""
+        fd = getattr(self.port, "fd", None)
+        if os.name == "posix" and fd is not None:
+            readable, _, _ = select.select([fd], [], [], max(0.0, timeout))
+            return bool(readable)
+        # Windows handles and pyserial URL ports: poll the queue
+        deadline = time.monotonic() + timeout
+        while not self.port.in_waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(POLL_INTERVAL, remaining))
+        return True
+
+    def readinto(self, buffer):
+        """
+        Receive into 'buffer', waiting at most the port timeout for the
+        first byte; return the count.
+
+        On POSIX the bytes go straight from the tty into 'buffer' with
+        readv(). Elsewhere, and for pyserial URL ports without a file
+        descriptor, pyserial's readinto() is used, which reads into a new
+        bytes object and copies it: on Windows only the socket, FIFO and
+        file transports avoid the copy.
+        """
+        fd = getattr(self.port, "fd", None)
+        if os.name != "posix" or fd is None:
+            return self.port.readinto(buffer)
+        readable, _, _ = select.select([fd], [], [], self.port.timeout)
+        if not readable:
+            return 0
+        try:
+            n = os.readv(fd, [buffer])
+        except BlockingIOError:
+            return 0
+        if not n:
+            # Same check as pyserial: readable but empty means the device went away
+            raise serial.SerialException(
+                "device reports readiness to read but returned no data "
+                "(device disconnected or multiple access on port?)")
+        return n
+
+    def write(self, data):
+        return self.port.write(data)
+
+    def close(self):
+        self.port.close()
+
+
+class StreamTransport:
+    """
+    Base for transports backed by a selectable socket or file descriptor.
+    Subclasses implement _fileno(), _recv_into(buffer) and _send(data);
+    _recv_into returns 0 on end-of-stream and None if nothing was available.
+    """
+
+    def __init__(self, timeout=0.1):
+        self.timeout = timeout
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        if not self.is_open or not self._wait_readable(0):
+            return 0
+        return CHUNK_SIZE
+
+    def wait_readable(self, timeout):
+        """Wait at most 'timeout' seconds for received bytes (or end-of-stream); return whether any are there."""
+        return self.is_open and self._wait_readable(max(0.0, timeout))
+
+    def read(self, size=1):
+        """Return up to 'size' bytes, waiting at most 'timeout' for the first."""
+        buffer = bytearray(size)
+        n = self.readinto(buffer)
+        return bytes(buffer[:n])
+
+    def readinto(self, buffer):
+        """Receive into 'buffer', waiting at most 'timeout' for the first byte; return the count."""
+        if not self.is_open or not self._wait_readable(self.timeout):
+            return 0
+        n = self._recv_into(buffer)
+        if n is None:
+            return 0
+        if not n:
+            # Peer closed the connection
+            self.close()
+        return n
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError("Transport is closed")
+        return self._send(data)
+
+    def _wait_readable(self, timeout):
+        readable, _, _ = select.select([self._fileno()], [], [], timeout)
+        return bool(readable)
+
+
+class TcpClientTransport(StreamTransport):
+    """Connect to a TCP server, e.g. a bridge forwarding the KW45 UART."""
+
+    def __init__(self, host, port, timeout=0.1, connect_timeout=5.0):
+        super().__init__(timeout)
+        self.sock = socket.create_connection((host, port), timeout=connect_timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _fileno(self):
+        return self.sock.fileno()
+
+    def _recv_into(self, buffer):
+        return self.sock.recv_into(buffer)
+
+    def _send(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.sock.close()
+
+
+class TcpServerTransport(TcpClientTransport):
+    """Listen on a TCP port and read from the first client that connects."""
+
+    def __init__(self, host, port, timeout=0.1):
+        StreamTransport.__init__(self, timeout)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen(1)
+        # Actual port, useful when binding to port 0
+        self.address = self.listener.getsockname()
+        self.sock = None
+
+    def _accept(self, timeout):
+        # Accept lazily so opening the transport never blocks
+        readable, _, _ = select.select([self.listener], [], [], timeout)
+        if readable:
+            self.sock, _ = self.listener.accept()
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self.sock is not None
+
+    @property
+    def in_waiting(self):
+        if self.is_open and self.sock is None and not self._accept(0):
+            return 0
+        return super().in_waiting
+
+    def wait_readable(self, timeout):
+        if self.is_open and self.sock is None and not self._accept(max(0.0, timeout)):
+            return False
+        return super().wait_readable(timeout)
+
+    def readinto(self, buffer):
+        if self.is_open and self.sock is None and not self._accept(self.timeout):
+            return 0
+        return super().readinto(buffer)
+
+    def write(self, data):
+        if self.sock is None:
+            raise IOError("No TCP client connected")
+        return super().write(data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            if self.sock is not None:
+                self.sock.close()
+            self.listener.close()
+
+
+class PipeTransport(StreamTransport):
+    """
+    Read from a POSIX FIFO or pty device. The path is opened read/write so
+    the transport does not see end-of-file when a writer goes away.
+    """
+
+    def __init__(self, path, timeout=0.1):
+        super().__init__(timeout)
+        self.fd = os.open(path, os.O_RDWR | os.O_NONBLOCK | getattr(os, "O_NOCTTY", 0))
+
+    def _fileno(self):
+        return self.fd
+
+    def _recv_into(self, buffer):
+        try:
+            return os.readv(self.fd, [buffer])
+        except BlockingIOError:
+            # Another reader won the race; nothing to return yet
+            return None
+
+    def _send(self, data):
+        return os.write(self.fd, data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            os.close(self.fd)
+
+
+class PtyTransport(PipeTransport):
+    """Create a new POSIX pty; other programs write to 'slave_name'."""
+
+    def __init__(self, timeout=0.1):
+        StreamTransport.__init__(self, timeout)
+        self.fd, self.slave_fd = os.openpty()
+        os.set_blocking(self.fd, False)
+        self.slave_name = os.ttyname(self.slave_fd)
+
+    def close(self):
+        if self.is_open:
+            super().close()
+            os.close(self.slave_fd)
+
+
+class FileTransport:
+    """Read a raw byte capture from disk as fast as it is consumed."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return max(0, self.size - self.file.tell()) if self.is_open else 0
+
+    def wait_readable(self, timeout):
+        # The whole capture is there from the start
+        return self.in_waiting > 0
+
+    def read(self, size=1):
+        if not self.is_open:
+            return b""
+        data = self.file.read(size)
+        if not data:
+            # End of capture
+            self.close()
+        return data
+
+    def readinto(self, buffer):
+        if not self.is_open:
+            return 0
+        n = self.file.readinto(buffer)
+        if not n:
+            # End of capture
+            self.close()
+        return n or 0
+
+    def write(self, data):
+        # Commands sent during a replay go nowhere
+        return len(data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.file.close()
+
+
+def _host_port(url):
+    if url.port is None:
+        raise ValueError(f"Missing port in '{url.geturl()}'")
+    return url.hostname or "0.0.0.0", url.port
+
+
+def open_transport(spec, baud=115200, timeout=0.1):
+    """Open the transport described by 'spec' (see the module docstring)."""
+    url = urlsplit(spec)
+    scheme = url.scheme.lower() if "://" in spec else ""
+    if scheme == "tcp":
+        return TcpClientTransport(*_host_port(url), timeout=timeout)
+    if scheme == "tcp-server":
+        return TcpServerTransport(*_host_port(url), timeout=timeout)
+    if scheme in ("pipe", "pty") and os.name != "posix":
+        raise ValueError(f"{scheme}:// is only available on POSIX systems")
+    if scheme == "pipe":
+        return PipeTransport(url2pathname(url.path), timeout=timeout)
+    if scheme == "pty":
+        return PtyTransport(timeout=timeout)
+    if scheme == "file":
+        return FileTransport(url2pathname(url.path))
+    # Plain port names and pyserial's own URLs (loop://, socket://, ...)
+    return SerialTransport(spec, baud, timeout=timeout)